@@ -0,0 +1,119 @@
+"""Compares request throughput of NullPool against a pooled WAL profile with concurrent readers and a writer.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_database_pool --readers 4 --seconds 5
+
+Each reader repeats the repository calls of a game page and a genre page and then ends its session like the
+app does after a request. A single writer keeps adding reviews at the same time.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from games.adapters.database_engine import create_database_engine
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.orm import metadata, map_model_to_tables, clear_model_mappers
+from games.adapters import repository_populate
+from games.domainmodel.model import User, make_comment
+from utils import get_project_root
+
+PROFILES = {
+    'NullPool': {'pool_class': 'NullPool'},
+    'QueuePool + WAL': {
+        'pool_class': 'QueuePool',
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': '-16000',
+                    'mmap_size': '134217728', 'temp_store': 'MEMORY'},
+    },
+}
+
+
+def build_template(directory: str) -> str:
+    path = os.path.join(directory, 'template.db')
+    engine = create_database_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+    repository = SqlAlchemyRepository(sessionmaker(bind=engine), bulk_load=True)
+    repository_populate.populate(get_project_root() / "games" / "adapters" / "data", repository)
+    repository.add_user(User("benchmark", "Password1!"))
+    repository.close_session()
+    engine.dispose()
+    return path
+
+
+def run_profile(path: str, profile: dict, readers: int, seconds: float):
+    engine = create_database_engine(f"sqlite:///{path}", pool_size=readers + 1, **profile)
+    repository = SqlAlchemyRepository(sessionmaker(bind=engine))
+    game_ids = [game.game_id for game in repository.get_games()]
+    genres = [genre.genre_name for genre in repository.get_genres()]
+    repository.close_session()
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                repository.get_game_by_id(random.choice(game_ids))
+                repository.get_games_of_type(random.choice(genres), 0, 21)
+                count('reads')
+            except Exception:
+                count('errors')
+            finally:
+                repository.close_session()
+
+    def writer():
+        while time.perf_counter() < deadline:
+            try:
+                game = repository.get_game_by_id(random.choice(game_ids))
+                repository.add_review(make_comment("Benchmark review", repository.get_user("benchmark"), 3, game,
+                                                   'database'))
+                count('writes')
+            except Exception:
+                count('errors')
+            finally:
+                repository.close_session()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help='number of concurrent reader threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    args = parser.parse_args()
+
+    clear_model_mappers()
+    map_model_to_tables()
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        template = build_template(directory)
+        for label, profile in PROFILES.items():
+            path = os.path.join(directory, 'bench.db')
+            shutil.copy(template, path)
+            counts = run_profile(path, profile, args.readers, args.seconds)
+            print(f"{label:>16}: {counts['reads'] / args.seconds:8.0f} reads/s  "
+                  f"{counts['writes'] / args.seconds:8.0f} writes/s  {counts['errors']} errors")
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
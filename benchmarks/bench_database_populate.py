@@ -0,0 +1,79 @@
+"""Compares populating an SQLite database through session.merge() with the bulk-load path.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_database_populate --copies 20
+
+The games csv file is repeated --copies times with shifted AppIDs to simulate a larger catalog.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.adapters.orm import metadata, map_model_to_tables, clear_model_mappers
+from games.domainmodel.model import Game
+from utils import get_project_root
+
+ID_OFFSET = 100_000_000
+
+
+def load_catalog(copies: int):
+    reader = GameFileCSVReader(str(get_project_root() / "games" / "adapters" / "data" / "games.csv"))
+    reader.read_csv_file()
+    games = []
+    for copy in range(copies):
+        for original in reader.dataset_of_games:
+            game = Game(original.game_id + copy * ID_OFFSET, original.title)
+            game.price = original.price
+            game.release_date = original.release_date
+            game.description = original.description
+            game.image_url = original.image_url
+            game.website_url = original.website_url
+            game.publisher = original.publisher
+            for genre in original.genres:
+                game.add_genre(genre)
+            games.append(game)
+    return list(reader.dataset_of_publishers), list(reader.dataset_of_genres), games
+
+
+def time_populate(publishers, genres, games, **repository_options) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", poolclass=NullPool)
+        metadata.create_all(engine)
+        repository = SqlAlchemyRepository(sessionmaker(bind=engine), **repository_options)
+
+        start = time.perf_counter()
+        repository.add_multiple_publishers(publishers)
+        repository.add_multiple_genres(genres)
+        repository.add_multiple_games(games)
+        elapsed = time.perf_counter() - start
+
+        repository.close_session()
+        engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=5, help='number of times the catalog is repeated')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per executemany call when bulk loading')
+    args = parser.parse_args()
+
+    # Domain objects have to be created after mapping, and each run gets fresh ones.
+    clear_model_mappers()
+    map_model_to_tables()
+    for label, options in (('merge', {}), ('bulk', {'bulk_load': True, 'batch_size': args.batch_size})):
+        publishers, genres, games = load_catalog(args.copies)
+        elapsed = time_populate(publishers, genres, games, **options)
+        print(f"{label:>6}: {len(games)} games in {elapsed:8.2f}s  {len(games) / elapsed:10.0f} games/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Measures MemoryRepository.search_games per query on the catalog and on a large synthetic catalog.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_fuzzy_search --synthetic-size 1000000
+
+The full dynamic programming edit distance used before is timed on the real catalog for comparison.
+"""
+import argparse
+import random
+import string
+import time
+
+from games.adapters import memory_repository
+from games.adapters.memory_repository import MemoryRepository, calculate_similarity, SIMILARITY_THRESHOLD
+from games.domainmodel.model import Game
+from utils import get_project_root
+
+
+def full_scan(games, query):
+    # search_games as it was before: every title lower-cased and compared with the full edit distance.
+    return [game for game in games if calculate_similarity(query, game.title.lower()) <= SIMILARITY_THRESHOLD]
+
+
+def time_per_query(function, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def misspell(title: str) -> str:
+    position = random.randrange(len(title))
+    return (title[:position] + random.choice(string.ascii_lowercase) + title[position + 1:]).lower()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=20, help='queries timed per catalog')
+    parser.add_argument('--synthetic-size', type=int, default=1_000_000, help='titles in the synthetic catalog')
+    args = parser.parse_args()
+
+    random.seed(0)
+    repo = MemoryRepository()
+    memory_repository.populate(repo, str(get_project_root() / "games" / "adapters" / "data" / "games.csv"))
+    games = repo.get_games()
+    queries = [misspell(random.choice(games).title) for _ in range(args.queries)]
+    full_time = time_per_query(lambda query: full_scan(games, query), queries)
+    banded_time = time_per_query(repo.search_games, queries)
+    print(f"{len(games):>10} games: full edit distance {full_time * 1e3:9.2f} ms   "
+          f"search_games {banded_time * 1e3:9.2f} ms")
+
+    synthetic = MemoryRepository()
+    words = list({word.lower() for game in games for word in game.title.split()})
+    synthetic.add_multiple_games(
+        Game(game_id, " ".join(random.choices(words, k=random.randint(1, 4)))) for game_id in range(args.synthetic_size))
+    synthetic_queries = [misspell(synthetic.get_game_by_id(random.randrange(args.synthetic_size)).title)
+                         for _ in range(max(1, args.queries // 4))]
+    synthetic_time = time_per_query(synthetic.search_games, synthetic_queries)
+    matches = sum(len(synthetic.search_games(query)) for query in synthetic_queries) / len(synthetic_queries)
+    print(f"{args.synthetic_size:>10} games: search_games {synthetic_time * 1e3:9.2f} ms   "
+          f"{matches:.0f} matches per query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Measures MemoryRepository game and user lookups as the catalog grows.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_memory_lookups --sizes 1000 100000 1000000
+
+Lookup time per call should stay flat from the smallest catalog to the largest.
+"""
+import argparse
+import random
+import time
+
+from games.adapters.memory_repository import MemoryRepository
+from games.domainmodel.model import Game, User
+
+
+def time_per_call(function, arguments) -> float:
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help='catalog sizes to measure')
+    parser.add_argument('--lookups', type=int, default=100_000, help='lookups timed per catalog size')
+    args = parser.parse_args()
+
+    random.seed(0)
+    for size in args.sizes:
+        repo = MemoryRepository()
+        repo.add_multiple_games(Game(game_id, f"Game {game_id}") for game_id in range(size))
+        for user_id in range(min(size, 100_000)):
+            repo.add_user(User(f"user{user_id}", "password"))
+
+        game_ids = [random.randrange(size) for _ in range(args.lookups)]
+        user_names = [f"user{random.randrange(min(size, 100_000))}" for _ in range(args.lookups)]
+        game_time = time_per_call(repo.get_game_by_id, game_ids)
+        user_time = time_per_call(repo.get_user, user_names)
+        print(f"{size:>10} games: get_game_by_id {game_time * 1e9:8.0f} ns   get_user {user_time * 1e9:8.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Reports how much memory the parsed catalog takes per game.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_model_memory --copies 10
+
+The games csv file is parsed --copies times into separate readers, and the memory held by the resulting
+games, publishers and genres is measured with tracemalloc. Text fields are included, so compare results
+between versions of the domain model rather than reading them as the size of a Game object alone.
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.domainmodel.model import Game
+from utils import get_project_root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=5, help='number of times the catalog is parsed')
+    args = parser.parse_args()
+
+    games_file_name = str(get_project_root() / "games" / "adapters" / "data" / "games.csv")
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    readers = []
+    for _ in range(args.copies):
+        reader = GameFileCSVReader(games_file_name)
+        reader.read_csv_file()
+        readers.append(reader)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    number_of_games = sum(len(reader.dataset_of_games) for reader in readers)
+    game = readers[0].dataset_of_games[0]
+    instance_size = sys.getsizeof(game) + (sys.getsizeof(game.__dict__) if vars(game) else 0)
+    distinct_genres = len({id(genre) for reader in readers for game in reader.dataset_of_games for genre in game.genres})
+
+    print(f"{number_of_games} games: {used / number_of_games:8.0f} bytes per game in total")
+    print(f"Game instance without its fields: {instance_size} bytes")
+    print(f"Distinct Genre objects referenced by the games: {distinct_genres}")
+
+
+if __name__ == '__main__':
+    main()
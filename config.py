@@ -19,10 +19,45 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Number of processes used to parse the games csv file (1 parses it in the app process)
+    INGEST_WORKERS = int(environ.get('INGEST_WORKERS', 1))
+
+    # File used to cache the parsed catalog between starts in memory mode (unset always parses the csv file)
+    CATALOG_SNAPSHOT_PATH = environ.get('CATALOG_SNAPSHOT_PATH')
+
+    # Seconds for which browsers and shared caches may reuse a catalog page for anonymous visitors before
+    # revalidating it with its ETag (0 revalidates on every request)
+    CATALOG_CACHE_MAX_AGE = int(environ.get('CATALOG_CACHE_MAX_AGE', 0))
+
+    # Number of rendered public catalog pages and of game card fragments kept in memory by each app process,
+    # least recently used first out. Both are emptied whenever the catalog version changes. 0 disables a cache.
+    PAGE_CACHE_SIZE = int(environ.get('PAGE_CACHE_SIZE', 256))
+    FRAGMENT_CACHE_SIZE = int(environ.get('FRAGMENT_CACHE_SIZE', 4096))
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
-        SQLALCHEMY_ECHO = True
\ No newline at end of file
+        SQLALCHEMY_ECHO = True
+
+    # Directory of populated template databases, one per games csv file. When set, a database that has to be
+    # (re)populated is copied from the template instead, and the template is only built when the csv file changes.
+    DATABASE_TEMPLATE_DIRECTORY = environ.get('DATABASE_TEMPLATE_DIRECTORY')
+
+    # Bulk loading writes batches of rows with executemany upserts instead of merging one object at a time
+    bulk_load_string = environ.get('SQLALCHEMY_BULK_LOAD', 'True')
+    SQLALCHEMY_BULK_LOAD = bulk_load_string.lower().strip() == "true"
+    SQLALCHEMY_BULK_BATCH_SIZE = int(environ.get('SQLALCHEMY_BULK_BATCH_SIZE', 500))
+
+    # Database performance profile. NullPool opens a connection per request; QueuePool keeps up to
+    # SQLALCHEMY_POOL_SIZE of them open. Each SQLITE_<PRAGMA> that is set is applied to every new connection,
+    # e.g. SQLITE_JOURNAL_MODE=WAL and SQLITE_SYNCHRONOUS=NORMAL.
+    SQLALCHEMY_POOL_CLASS = environ.get('SQLALCHEMY_POOL_CLASS', 'NullPool')
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLITE_JOURNAL_MODE = environ.get('SQLITE_JOURNAL_MODE')
+    SQLITE_SYNCHRONOUS = environ.get('SQLITE_SYNCHRONOUS')
+    SQLITE_CACHE_SIZE = environ.get('SQLITE_CACHE_SIZE')
+    SQLITE_MMAP_SIZE = environ.get('SQLITE_MMAP_SIZE')
+    SQLITE_TEMP_STORE = environ.get('SQLITE_TEMP_STORE')
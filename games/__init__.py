@@ -1,22 +1,29 @@
 """Initialize Flask app."""
 from pathlib import Path
 
+import click
+
 from flask import Flask, render_template
 import games.adapters.repository as repo
 
-from games.adapters import database_repository, repository_populate
-from games.adapters.orm import metadata, map_model_to_tables
+from games.adapters import database_repository, repository_populate, catalog_delta, schema_upgrade, database_template
+from games.adapters.database_engine import create_database_engine, sqlite_pragmas
+from games.adapters.orm import metadata, map_model_to_tables, clear_model_mappers, search_table
 
 from games.adapters.repository_populate import populate
 from games.adapters.memory_repository import MemoryRepository
-from flask import Flask, render_template, redirect, url_for, request
+from flask import Flask, render_template, redirect, url_for, request, abort
 from games.authentication.authentication import login_required
 from flask import session
 import games.authentication.services as auth_services
+from games import caching
+from games.caching import catalog_page
+
+from sqlalchemy.orm import sessionmaker
+
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
+# Number of reviews listed on each page of a profile, newest first.
+REVIEWS_PER_PROFILE = 20
 
 
 def create_app(test_config=None):
@@ -37,11 +44,18 @@ def create_app(test_config=None):
         data_path = app.config['TEST_DATA_PATH']
 
     if app.config['REPOSITORY'] == 'memory':
+        # Games kept in memory store their fields in slots, which only unmapped domain classes have.
+        clear_model_mappers()
         # Create the MemoryRepository implementation for a memory-based repository.
-        repo.repo_instance = memory_repository.MemoryRepository()
+        repo.repo_instance = MemoryRepository()
         # fill the content of the repository from the provided csv files (has to be done every time we start app!)
-        database_mode = False
-        repository_populate.populate(data_path, repo.repo_instance, database_mode)
+        # When a snapshot path is configured, the parsed csv files are reused across starts until they change.
+        snapshot_path = app.config.get('CATALOG_SNAPSHOT_PATH')
+        if snapshot_path:
+            repository_populate.populate_from_snapshot(data_path, repo.repo_instance, snapshot_path,
+                                                       max_workers=app.config['INGEST_WORKERS'])
+        else:
+            repository_populate.populate(data_path, repo.repo_instance, max_workers=app.config['INGEST_WORKERS'])
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
@@ -52,33 +66,84 @@ def create_app(test_config=None):
         # leading to a URI of "sqlite:///covid-19.db".
         # Note that create_engine does not establish any actual DB connection directly!
         database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        # The pool and the SQLite PRAGMAs come from the database performance profile in config.Config.
+        database_engine = create_database_engine(
+            database_uri, echo=database_echo, pool_class=app.config['SQLALCHEMY_POOL_CLASS'],
+            pool_size=app.config['SQLALCHEMY_POOL_SIZE'], pragmas=sqlite_pragmas(app.config))
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
-        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+        repo.repo_instance = database_repository.SqlAlchemyRepository(
+            session_factory, bulk_load=app.config['SQLALCHEMY_BULK_LOAD'],
+            batch_size=app.config['SQLALCHEMY_BULK_BATCH_SIZE'])
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
             # For testing, or first-time use of the web application, reinitialise the database.
-            clear_mappers()
-            metadata.create_all(database_engine)  # Conditionally create database tables.
-            for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
-                database_engine.execute(table.delete())
-
+            clear_model_mappers()
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
-            populate(data_path, repo.repo_instance)
+            template_directory = app.config.get('DATABASE_TEMPLATE_DIRECTORY')
+            if template_directory:
+                # Copy a database populated from the same csv file, building it first if this is the first start.
+                template = database_template.ensure_template(
+                    template_directory, data_path, batch_size=app.config['SQLALCHEMY_BULK_BATCH_SIZE'],
+                    max_workers=app.config['INGEST_WORKERS'])
+                database_template.clone_into_engine(template, database_engine)
+            else:
+                metadata.create_all(database_engine)  # Conditionally create database tables.
+                for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
+                    database_engine.execute(table.delete())
+                database_engine.execute(search_table.delete())
+
+                populate(data_path, repo.repo_instance, max_workers=app.config['INGEST_WORKERS'])
+                # Lets the first refresh-catalog after this apply only what changed since.
+                hash_session = session_factory()
+                try:
+                    catalog_delta.record_row_hashes(data_path, hash_session)
+                finally:
+                    hash_session.close()
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
-
+            # Databases created by earlier versions get the tables and indexes added since.
+            schema_upgrade.upgrade_schema(database_engine)
+
+        @app.cli.command('refresh-catalog')
+        def refresh_catalog():
+            """Apply changes in the games csv file to the database without repopulating it."""
+            session = session_factory()
+            try:
+                result = catalog_delta.ingest_delta(data_path, session)
+            finally:
+                session.close()
+            print(f"Catalog refreshed: {result.inserted} inserted, {result.updated} updated, "
+                  f"{result.deleted} deleted, {result.retained} kept for existing reviews or wishlists")
+
+        @app.cli.command('clone-database')
+        @click.argument('destination')
+        def clone_database(destination):
+            """Write a new database populated from the games csv file to DESTINATION, e.g. for a staging instance."""
+            template_directory = app.config.get('DATABASE_TEMPLATE_DIRECTORY')
+            if not template_directory:
+                raise click.UsageError("DATABASE_TEMPLATE_DIRECTORY must be set to clone databases.")
+            template = database_template.ensure_template(
+                template_directory, data_path, batch_size=app.config['SQLALCHEMY_BULK_BATCH_SIZE'],
+                max_workers=app.config['INGEST_WORKERS'])
+            database_template.clone_to_file(template, destination)
+            print(f"Cloned {template} to {destination}")
+
+
+    caching.init_app(app)
+
+    @app.context_processor
+    def inject_genre_links():
+        # The genre links of the side navigation bar, with the live number of games of each genre.
+        return {'genre_links': repo.repo_instance.get_genre_counts()}
 
     # Build the application - these steps require an application context.
     with app.app_context():
@@ -122,6 +187,7 @@ def create_app(test_config=None):
         return redirect(url_for('view_game', id=game_id))
 
     @app.route('/search')
+    @catalog_page()
     def search():
         query = request.args.get('query', '').strip()
         if query:
@@ -145,23 +211,32 @@ def create_app(test_config=None):
 
         user = repo.repo_instance.get_user(name)
         wishlist = repo.repo_instance.get_wishlist_games(user)
+        page = max(request.args.get('page', 1, type=int), 1)
+        # One review more than a page holds tells whether there is a next page.
+        reviews = repo.repo_instance.get_reviews(repo.repo_instance.get_user(username),
+                                                 offset=REVIEWS_PER_PROFILE * (page - 1), limit=REVIEWS_PER_PROFILE + 1)
         return render_template('profile.html', username=username,
                                user=repo.repo_instance.get_user(username),
-                               reviews=repo.repo_instance.get_reviews(repo.repo_instance.get_user(username)),
+                               reviews=reviews[:REVIEWS_PER_PROFILE], page=page,
+                               has_next_page=len(reviews) > REVIEWS_PER_PROFILE,
                                wishlist=wishlist, num_games=repo.repo_instance.get_number_of_wishlist_games(user))
 
     @app.route('/add_to_wishlist/<int:game_id>', methods=['POST'])
     @login_required
     def add_game_to_wishlist(game_id):
-        repo.repo_instance.add_wishlist_game(repo.repo_instance.get_game_by_id(game_id),
-                                             repo.repo_instance.get_user(session.get('user_name')))
+        game = repo.repo_instance.get_game_by_id(game_id)
+        if game is None:
+            abort(404)
+        repo.repo_instance.add_wishlist_game(game, repo.repo_instance.get_user(session.get('user_name')))
         return redirect(url_for('gameDescription', game_id=game_id))
 
     @app.route('/remove_from_wishlist/<int:game_id>', methods=['POST'])
     @login_required
     def remove_from_wishlist(game_id):
-        repo.repo_instance.remove_wishlist_game(repo.repo_instance.get_game_by_id(game_id),
-                                                repo.repo_instance.get_user(session.get('user_name')))
+        game = repo.repo_instance.get_game_by_id(game_id)
+        if game is None:
+            abort(404)
+        repo.repo_instance.remove_wishlist_game(game, repo.repo_instance.get_user(session.get('user_name')))
         return redirect(url_for('gameDescription', game_id=game_id))
 
     return app
\ No newline at end of file
@@ -0,0 +1,116 @@
+from array import array
+from datetime import datetime
+from itertools import compress, repeat
+from operator import and_, le, lt, ge, eq
+from typing import List, Optional, Tuple
+
+from games.domainmodel.model import Game
+
+SORT_KEYS = ('id', 'price', 'release')
+
+# Stored as the release ordinal of games without a release date. Real ordinals start at 1, so undated games sort
+# before every date, as NULL does in SQL, and the release date filters leave them out, as comparing NULL does.
+UNDATED = -1
+
+
+def release_ordinal(release_date: str) -> Optional[int]:
+    """ Converts an "Oct 21, 2008" release date to a proleptic Gregorian ordinal, or None if there is none. """
+    if not release_date:
+        return None
+    return datetime.strptime(release_date, "%b %d, %Y").toordinal()
+
+
+class ColumnarCatalog:
+    """ Game attributes used for filtering and sorting, stored column by column, mostly in typed arrays.
+
+    Row i of every column describes the same game. Queries work on row numbers with map, compress and
+    sorted over the columns, so the per-row work runs in C, and they return game ids rather than Games.
+    """
+
+    def __init__(self):
+        self.__ids = array('q')
+        self.__prices = array('d')
+        self.__release_ordinals = array('l')
+        self.__publisher_codes = array('l')
+        # Genre membership as one bit per genre in an int per row, which grows with the number of genres.
+        self.__genre_masks = []
+        self.__publisher_code_by_name = dict()
+        self.__genre_bit_by_name = dict()
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def append(self, game: Game):
+        self.__ids.append(game.game_id)
+        self.__prices.append(game.price if game.price is not None else 0.0)
+        self.__release_ordinals.append(UNDATED if game.release_ordinal is None else game.release_ordinal)
+
+        publisher_name = game.publisher.publisher_name if game.publisher else None
+        self.__publisher_codes.append(
+            self.__publisher_code_by_name.setdefault(publisher_name, len(self.__publisher_code_by_name)))
+
+        mask = 0
+        for genre in game.genres:
+            bit = self.__genre_bit_by_name.get(genre.genre_name)
+            if bit is None:
+                bit = self.__genre_bit_by_name[genre.genre_name] = len(self.__genre_bit_by_name)
+            mask |= 1 << bit
+        self.__genre_masks.append(mask)
+
+    def extend(self, games):
+        for game in games:
+            self.append(game)
+
+    def __matching_rows(self, genre=None, publisher=None, min_price=None, max_price=None,
+                        released_from=None, released_to=None) -> List[int]:
+        rows = range(len(self.__ids))
+
+        def keep(column, test, value):
+            # Narrows rows to those where test(value, column[row]) holds, without a Python-level loop.
+            return list(compress(rows, map(test, repeat(value), map(column.__getitem__, rows))))
+
+        if genre is not None:
+            bit = self.__genre_bit_by_name.get(genre)
+            if bit is None:
+                return []
+            rows = keep(self.__genre_masks, and_, 1 << bit)
+        if publisher is not None:
+            code = self.__publisher_code_by_name.get(publisher)
+            if code is None:
+                return []
+            rows = keep(self.__publisher_codes, eq, code)
+        if min_price is not None:
+            rows = keep(self.__prices, le, min_price)
+        if max_price is not None:
+            rows = keep(self.__prices, ge, max_price)
+        if released_from is not None or released_to is not None:
+            rows = keep(self.__release_ordinals, lt, UNDATED)
+        if released_from is not None:
+            rows = keep(self.__release_ordinals, le, released_from.toordinal())
+        if released_to is not None:
+            rows = keep(self.__release_ordinals, ge, released_to.toordinal())
+        return list(rows)
+
+    def count(self, **filters) -> int:
+        """ Returns the number of games matching the filters taken by query. """
+        return len(self.__matching_rows(**filters))
+
+    def query(self, sort_by: str = 'id', descending: bool = False, offset: int = 0, limit: int = None,
+              **filters) -> Tuple[int, List[int]]:
+        """ Returns the number of matching games and the ids of one page of them.
+
+        Filters are genre and publisher names, min_price/max_price and released_from/released_to dates,
+        all inclusive. Games are sorted by id, price or release date, ties always in ascending id order.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Games can only be sorted by one of {', '.join(SORT_KEYS)}!")
+        rows = self.__matching_rows(**filters)
+        rows.sort(key=self.__ids.__getitem__)
+        if sort_by == 'price':
+            rows.sort(key=self.__prices.__getitem__, reverse=descending)
+        elif sort_by == 'release':
+            rows.sort(key=self.__release_ordinals.__getitem__, reverse=descending)
+        elif descending:
+            rows.reverse()
+        end = None if limit is None else offset + limit
+        return len(rows), [self.__ids[row] for row in rows[offset:end]]
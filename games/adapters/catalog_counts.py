@@ -0,0 +1,74 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from games.adapters.datareader.csvdatareader import DEFAULT_BATCH_SIZE
+from games.adapters.orm import games_table, game_genres_table, genre_counts_table
+
+# Key of the count of all games in genre_counts. No genre has an empty name.
+ALL_GAMES = ""
+
+
+def counts_of_games(session, game_ids) -> Counter:
+    """ Returns how many of the given games there are in all and in each genre. """
+    counts = Counter()
+    game_ids = list(game_ids)
+    for start in range(0, len(game_ids), DEFAULT_BATCH_SIZE):
+        batch = game_ids[start:start + DEFAULT_BATCH_SIZE]
+        counts[ALL_GAMES] += session.execute(
+            select([func.count()]).select_from(games_table).where(games_table.c.game_id.in_(batch))).scalar()
+        counts.update(dict(session.execute(
+            select([game_genres_table.c.genre_name, func.count()]).where(game_genres_table.c.game_id.in_(batch))
+            .group_by(game_genres_table.c.genre_name)).all()))
+    return counts
+
+
+def apply_count_changes(session, before: Counter, after: Counter):
+    changes = [{'genre_name': name, 'game_count': after[name] - before[name]}
+               for name in before.keys() | after.keys() if after[name] != before[name]]
+    if not changes:
+        return
+    upsert = sqlite_insert(genre_counts_table)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[genre_counts_table.c.genre_name],
+        set_={'game_count': genre_counts_table.c.game_count + upsert.excluded.game_count})
+    session.execute(upsert, changes)
+    session.execute(genre_counts_table.delete().where(genre_counts_table.c.game_count <= 0))
+
+
+@contextmanager
+def tracking_counts(session, game_ids):
+    """ Adjusts genre_counts by the difference the enclosed writes make to the given games.
+
+    Only those games are counted, before and after, so the work grows with the batch and not with the catalog.
+    Pending ORM changes have to be flushed before the block ends.
+    """
+    game_ids = list(game_ids)
+    before = counts_of_games(session, game_ids)
+    yield
+    apply_count_changes(session, before, counts_of_games(session, game_ids))
+
+
+def rebuild_counts(session):
+    session.execute(genre_counts_table.delete())
+    session.execute(genre_counts_table.insert().from_select(
+        ['genre_name', 'game_count'],
+        select([game_genres_table.c.genre_name, func.count()]).group_by(game_genres_table.c.genre_name)))
+    session.execute(genre_counts_table.insert().values(
+        genre_name=ALL_GAMES, game_count=select([func.count()]).select_from(games_table).scalar_subquery()))
+
+
+def get_count(session, genre_name: str = ALL_GAMES) -> int:
+    count = session.execute(select([genre_counts_table.c.game_count]).where(
+        genre_counts_table.c.genre_name == genre_name)).scalar()
+    return count or 0
+
+
+def get_genre_counts(session) -> List[Tuple[str, int]]:
+    """ Returns (genre name, number of games) for every genre that has games, by genre name. """
+    rows = session.execute(select([genre_counts_table.c.genre_name, genre_counts_table.c.game_count]).where(
+        genre_counts_table.c.genre_name != ALL_GAMES).order_by(genre_counts_table.c.genre_name))
+    return [(genre_name, game_count) for genre_name, game_count in rows]
@@ -0,0 +1,172 @@
+import csv
+import hashlib
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy import select, bindparam
+
+from games.adapters.datareader.csvdatareader import build_game, DEFAULT_BATCH_SIZE
+from games.adapters.catalog_search import refresh_search_rows
+from games.adapters.catalog_counts import tracking_counts
+from games.adapters.catalog_version import bump_version
+from games.adapters.orm import (
+    games_table, game_genres_table, publishers_table, genres_table, reviews_table, wishlist_table,
+    catalog_hashes_table, game_to_row
+)
+
+# The csv columns that end up in the database. Changes to any other column do not make a game dirty.
+HASHED_COLUMNS = ("AppID", "Name", "Release date", "Price", "About the game", "Header image", "Website",
+                  "Publishers", "Genres")
+
+
+class DeltaIngestResult(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    # Games missing from the csv file that are kept because reviews or wishlists still refer to them.
+    retained: int
+
+
+def row_hash(row: dict) -> str:
+    values = "\x1f".join(row.get(column) or "" for column in HASHED_COLUMNS)
+    return hashlib.sha256(values.encode("utf-8")).hexdigest()
+
+
+def _chunks(values, size=DEFAULT_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _first_rows(file):
+    """ Yields each valid game of the csv file with its row. Like the csv reader, the first valid row of an
+    AppID is the one kept and any later row for it is skipped. """
+    seen_ids = set()
+    for row in csv.DictReader(file):
+        try:
+            game = build_game(row)
+        except ValueError as e:
+            print(f"Skipping row due to invalid data: {e}")
+            continue
+        except KeyError as e:
+            print(f"Skipping row due to missing key: {e}")
+            continue
+        if game.game_id in seen_ids:
+            print(f"Skipping duplicate row for game {game.game_id}")
+            continue
+        seen_ids.add(game.game_id)
+        yield game, row
+
+
+def record_row_hashes(data_path: Path, session):
+    """ Stores the hash of the csv row of every game in the database, replacing any stored before.
+
+    A full populate writes games without their hashes, and the first ingest_delta after it would otherwise
+    see every game as changed and rewrite the whole catalog.
+    """
+    games_file_name = str(Path(data_path) / "games.csv")
+    if not os.path.exists(games_file_name):
+        return
+    existing_ids = set(session.execute(select([games_table.c.game_id])).scalars())
+    hashes = {}
+    with open(games_file_name, 'r', encoding='utf-8-sig') as file:
+        for game, row in _first_rows(file):
+            if game.game_id in existing_ids:
+                hashes[game.game_id] = row_hash(row)
+    session.execute(catalog_hashes_table.delete())
+    for items in _chunks(hashes.items()):
+        session.execute(catalog_hashes_table.insert(),
+                        [{'game_id': game_id, 'row_hash': digest} for game_id, digest in items])
+    session.commit()
+
+
+def ingest_delta(data_path: Path, session) -> DeltaIngestResult:
+    """ Brings the catalog tables in line with the games csv file in a single transaction.
+
+    Each csv row is hashed and compared with the hash stored for its AppID, and only new, changed and
+    removed games are written, along with their genre links and any publishers and genres that appear
+    or stop being used. The search rows and genre counts of those games are updated as well, and the catalog
+    version is bumped if anything changed. Users, reviews and wishlists are never modified.
+    """
+    games_file_name = str(Path(data_path) / "games.csv")
+    if not os.path.exists(games_file_name):
+        # Treating a missing file as an empty catalog would delete every game.
+        raise FileNotFoundError(f"path {games_file_name} does not exist!")
+
+    try:
+        stored_hashes = dict(session.execute(select([catalog_hashes_table.c.game_id, catalog_hashes_table.c.row_hash])).all())
+        existing_ids = set(session.execute(select([games_table.c.game_id])).scalars())
+
+        changed_games = []
+        changed_hashes = {}
+        seen_ids = set()
+        with open(games_file_name, 'r', encoding='utf-8-sig') as file:
+            for game, row in _first_rows(file):
+                seen_ids.add(game.game_id)
+                digest = row_hash(row)
+                if game.game_id in existing_ids and stored_hashes.get(game.game_id) == digest:
+                    continue
+                changed_games.append(game)
+                changed_hashes[game.game_id] = digest
+
+        referenced_ids = set(session.execute(select([reviews_table.c.game_id])).scalars())
+        referenced_ids.update(session.execute(select([wishlist_table.c.game_id])).scalars())
+        removed_ids = existing_ids - seen_ids
+        retained_ids = removed_ids & referenced_ids
+        removed_ids -= retained_ids
+
+        inserted_games = [game for game in changed_games if game.game_id not in existing_ids]
+        updated_games = [game for game in changed_games if game.game_id in existing_ids]
+
+        # Publishers and genres have to exist before the games that refer to them.
+        existing_publishers = set(session.execute(select([publishers_table.c.name])).scalars())
+        new_publishers = {game.publisher.publisher_name for game in changed_games if game.publisher} - existing_publishers
+        if new_publishers:
+            session.execute(publishers_table.insert(), [{'name': name} for name in new_publishers])
+
+        existing_genres = set(session.execute(select([genres_table.c.genre_name])).scalars())
+        new_genres = {genre.genre_name for game in changed_games for genre in game.genres} - existing_genres
+        if new_genres:
+            session.execute(genres_table.insert(), [{'genre_name': name} for name in new_genres])
+
+        with tracking_counts(session, removed_ids | changed_hashes.keys()):
+            # Genre links of changed and removed games are rebuilt from scratch.
+            for ids in _chunks(removed_ids | {game.game_id for game in updated_games}):
+                session.execute(game_genres_table.delete().where(game_genres_table.c.game_id.in_(ids)))
+            for ids in _chunks(removed_ids | changed_hashes.keys()):
+                session.execute(catalog_hashes_table.delete().where(catalog_hashes_table.c.game_id.in_(ids)))
+            for ids in _chunks(removed_ids):
+                session.execute(games_table.delete().where(games_table.c.game_id.in_(ids)))
+
+            for games in _chunks(updated_games):
+                rows = [game_to_row(game) for game in games]
+                for row in rows:
+                    row['b_game_id'] = row.pop('game_id')
+                session.execute(games_table.update().where(games_table.c.game_id == bindparam('b_game_id')), rows)
+            for games in _chunks(inserted_games):
+                session.execute(games_table.insert(), [game_to_row(game) for game in games])
+
+            for games in _chunks(changed_games):
+                links = [{'game_id': game.game_id, 'genre_name': genre.genre_name} for game in games for genre in game.genres]
+                if links:
+                    session.execute(game_genres_table.insert(), links)
+        for ids in _chunks(changed_hashes):
+            session.execute(catalog_hashes_table.insert(),
+                            [{'game_id': game_id, 'row_hash': changed_hashes[game_id]} for game_id in ids])
+        refresh_search_rows(session, removed_ids | changed_hashes.keys())
+
+        # Drop publishers and genres that no game uses anymore.
+        session.execute(publishers_table.delete().where(
+            publishers_table.c.name.not_in(select([games_table.c.publisher_name]).where(games_table.c.publisher_name.is_not(None)))))
+        session.execute(genres_table.delete().where(
+            genres_table.c.genre_name.not_in(select([game_genres_table.c.genre_name]).where(game_genres_table.c.genre_name.is_not(None)))))
+
+        if changed_games or removed_ids:
+            bump_version(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return DeltaIngestResult(len(inserted_games), len(updated_games), len(removed_ids), len(retained_ids))
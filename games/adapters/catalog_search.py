@@ -0,0 +1,77 @@
+import re
+
+from sqlalchemy import DDL, func, inspect, literal_column, select
+
+from games.adapters.datareader.csvdatareader import DEFAULT_BATCH_SIZE
+from games.adapters.orm import games_table, game_genres_table, search_table, SEARCH_TABLE_DDL
+
+# Weights of the title, genres, publisher and description columns when ranking matches with bm25.
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# Queries shorter than a trigram are too short for the index, and are matched as substrings of the titles instead.
+MIN_INDEXED_QUERY_LENGTH = 3
+
+SEARCH_COLUMNS = ['rowid', 'title', 'genres', 'publisher', 'description']
+
+
+def match_expression(query: str) -> str:
+    """ Turns free text into an FTS5 query that matches games containing every word, the words as prefixes.
+
+    Only word characters are kept, so the user's text can never be read as FTS5 query syntax.
+    """
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", query.lower()))
+
+
+def title_contains(text: str):
+    """ Matches the games whose title contains text. SQLite's LIKE ignores the case of ASCII letters. """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return games_table.c.game_title.like(f"%{escaped}%", escape="\\")
+
+
+def bm25_rank():
+    # Lower is better, so ascending order puts the best matches first.
+    return func.bm25(literal_column(search_table.name), *COLUMN_WEIGHTS)
+
+
+def match_clause(expression: str):
+    return literal_column(search_table.name).match(expression)
+
+
+def _search_rows():
+    return select([
+        games_table.c.game_id,
+        games_table.c.game_title,
+        func.group_concat(game_genres_table.c.genre_name, " "),
+        games_table.c.publisher_name,
+        games_table.c.game_description,
+    ]).select_from(
+        games_table.outerjoin(game_genres_table, game_genres_table.c.game_id == games_table.c.game_id)
+    ).group_by(games_table.c.game_id)
+
+
+def refresh_search_rows(session, game_ids):
+    """ Rewrites the search rows of the given games from the games and game_genres tables.
+
+    Works on a session or a connection, inside the caller's transaction. Games that no longer exist simply
+    lose their rows.
+    """
+    game_ids = list(game_ids)
+    for start in range(0, len(game_ids), DEFAULT_BATCH_SIZE):
+        batch = game_ids[start:start + DEFAULT_BATCH_SIZE]
+        session.execute(search_table.delete().where(search_table.c.rowid.in_(batch)))
+        session.execute(search_table.insert().from_select(
+            SEARCH_COLUMNS, _search_rows().where(games_table.c.game_id.in_(batch))))
+
+
+def rebuild_search_index(session):
+    session.execute(search_table.delete())
+    session.execute(search_table.insert().from_select(SEARCH_COLUMNS, _search_rows()))
+
+
+def ensure_search_index(engine):
+    """ Creates and fills the search table of a database that predates it. """
+    if inspect(engine).has_table(search_table.name):
+        return
+    with engine.begin() as connection:
+        connection.execute(DDL(SEARCH_TABLE_DDL))
+        rebuild_search_index(connection)
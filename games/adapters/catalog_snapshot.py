@@ -0,0 +1,69 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+from games.adapters.datareader.csvdatareader import GameBatch
+
+# Bump whenever the domain model or the layout below changes, so that old snapshots are rebuilt.
+SNAPSHOT_VERSION = 3
+SNAPSHOT_MAGIC = b'GAMESNAP'
+
+
+def csv_fingerprint(csv_path) -> dict:
+    """ Identifies the contents of a csv file by its size, modification time and sha256 hash. """
+    stat = os.stat(csv_path)
+    sha256 = hashlib.sha256()
+    with open(csv_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+
+
+def is_fresh(fingerprint: dict, csv_path) -> bool:
+    """ Checks whether a snapshot fingerprint still describes the csv file.
+
+    A different size is always stale and an unchanged modification time is always fresh. Otherwise the
+    file is rehashed, so that a touched but unmodified csv file does not force a re-parse.
+    """
+    stat = os.stat(csv_path)
+    if stat.st_size != fingerprint.get('size'):
+        return False
+    if stat.st_mtime_ns == fingerprint.get('mtime_ns'):
+        return True
+    return csv_fingerprint(csv_path)['sha256'] == fingerprint.get('sha256')
+
+
+def write_snapshot(snapshot_path, fingerprint: dict, batch: GameBatch):
+    """ Stores the parsed catalog, replacing any previous snapshot atomically. """
+    snapshot_path = Path(snapshot_path)
+    temporary_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(temporary_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(SNAPSHOT_VERSION.to_bytes(4, 'big'))
+        pickle.dump(fingerprint, file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((batch.publishers, batch.genres, batch.games), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path, csv_path) -> Optional[GameBatch]:
+    """ Returns the catalog stored in the snapshot, or None if it is missing, unreadable or stale.
+
+    Snapshots are unpickled, so they must only ever be read from a location the app itself writes to.
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, 'rb') as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            if int.from_bytes(file.read(4), 'big') != SNAPSHOT_VERSION:
+                return None
+            if not is_fresh(pickle.load(file), csv_path):
+                return None
+            publishers, genres, games = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError) as e:
+        print(f"Ignoring unreadable catalog snapshot {snapshot_path}: {e}")
+        return None
+    return GameBatch(games, publishers, genres)
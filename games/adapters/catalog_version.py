@@ -0,0 +1,29 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from games.adapters.orm import catalog_version_table
+
+# Id of the only row of catalog_version.
+VERSION_ROW = 1
+
+
+def bump_version(session):
+    """ Records a write to the games or their reviews, as part of the enclosing transaction. """
+    upsert = sqlite_insert(catalog_version_table).values(id=VERSION_ROW, version=1, modified_at=time.time())
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[catalog_version_table.c.id],
+        set_={'version': catalog_version_table.c.version + 1, 'modified_at': upsert.excluded.modified_at})
+    session.execute(upsert)
+
+
+def get_version(session) -> Tuple[int, Optional[datetime]]:
+    """ Returns the catalog version and the time it was reached, or (0, None) before the first write. """
+    row = session.execute(select([catalog_version_table.c.version, catalog_version_table.c.modified_at]).where(
+        catalog_version_table.c.id == VERSION_ROW)).first()
+    if row is None:
+        return 0, None
+    return row.version, datetime.fromtimestamp(row.modified_at, timezone.utc)
@@ -0,0 +1,60 @@
+import re
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+POOL_CLASSES = {
+    'NullPool': NullPool,
+    'QueuePool': QueuePool,
+    'SingletonThreadPool': SingletonThreadPool,
+    'StaticPool': StaticPool,
+}
+
+# PRAGMAs that may be set on every new connection, in the order they are applied.
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+
+_PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+def sqlite_pragmas(config) -> dict:
+    """ Returns the PRAGMAs configured through SQLITE_<NAME> settings, leaving out the unset ones. """
+    pragmas = {}
+    for name in SQLITE_PRAGMAS:
+        value = config.get(f"SQLITE_{name.upper()}")
+        if value is None or str(value).strip() == "":
+            continue
+        value = str(value).strip()
+        if not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"Invalid value {value!r} for PRAGMA {name}!")
+        pragmas[name] = value
+    return pragmas
+
+
+def create_database_engine(database_uri: str, echo: bool = False, pool_class: str = 'NullPool',
+                           pool_size: int = 5, pragmas: dict = None):
+    """ Creates the engine for database mode with the given pool and per-connection PRAGMAs.
+
+    The PRAGMAs are applied by a connect event, so each pooled connection is set up once when it is opened
+    rather than on every checkout. journal_mode=WAL is stored in the database file itself and lets readers
+    carry on while a writer commits.
+    """
+    if pool_class not in POOL_CLASSES:
+        raise ValueError(f"Unknown pool class {pool_class}, expected one of {', '.join(POOL_CLASSES)}!")
+    pool_options = {}
+    if POOL_CLASSES[pool_class] is QueuePool:
+        pool_options = {'pool_size': pool_size, 'max_overflow': pool_size}
+    elif POOL_CLASSES[pool_class] is SingletonThreadPool:
+        pool_options = {'pool_size': pool_size}
+
+    engine = create_engine(database_uri, connect_args={"check_same_thread": False},
+                           poolclass=POOL_CLASSES[pool_class], echo=echo, **pool_options)
+
+    if pragmas:
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+    return engine
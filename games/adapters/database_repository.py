@@ -2,11 +2,18 @@ from datetime import date
 from typing import List
 
 from sqlalchemy import desc, asc
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, joinedload, selectinload, defer
 from games.domainmodel.model import User, Game, Review, Genre, Publisher, Wishlist
-from games.adapters.repository import AbstractRepository
+from games.adapters.repository import AbstractRepository, GENRE_SORT_KEYS, GAME_SORT_KEYS, SEARCH_RESULT_LIMIT
+from games.adapters.orm import (
+    games_table, game_genres_table, publishers_table, genres_table, reviews_table, wishlist_table, search_table,
+    game_to_row
+)
+from games.adapters import catalog_search, catalog_counts, catalog_version
+from games.adapters.datareader.csvdatareader import DEFAULT_BATCH_SIZE
 from flask import request, render_template, redirect, url_for, session
 
 
@@ -42,10 +49,30 @@ class SessionContextManager:
             self.__session.close()
 
 
+def detail_loading():
+    # The detail page shows the publisher, the genres and every review with its author. Loading them up front
+    # costs a fixed number of queries, where lazy loading would cost one per review.
+    return (joinedload(Game._Game__publisher), selectinload(Game._Game__genres),
+            selectinload(Game._Game__reviews).joinedload(Review._Review__user))
+
+
+def listing_loading():
+    # Lists of games never show the description, which is by far the longest column.
+    return (defer(Game._Game__description),)
+
+
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, bulk_load: bool = False, batch_size: int = DEFAULT_BATCH_SIZE):
         self._session_cm = SessionContextManager(session_factory)
+        # In bulk-load mode the add_multiple_* methods write plain rows with executemany upserts, batch_size
+        # rows at a time, instead of merging every object through the session.
+        self._bulk_load = bulk_load
+        self._batch_size = batch_size
+
+    def _execute_in_batches(self, scm, statement, rows: list):
+        for start in range(0, len(rows), self._batch_size):
+            scm.session.execute(statement, rows[start:start + self._batch_size])
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -70,16 +97,57 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def add_game(self, game: Game):
         with self._session_cm as scm:
-            scm.session.add(game)
+            with catalog_counts.tracking_counts(scm.session, [game.game_id]):
+                scm.session.add(game)
+                scm.session.flush()
+            catalog_search.refresh_search_rows(scm.session, [game.game_id])
+            catalog_version.bump_version(scm.session)
             scm.commit()
 
     def add_multiple_games(self, games: List[Game]):
+        games = list(games)
+        if self._bulk_load:
+            self._bulk_upsert_games(games)
+            return
+        game_ids = [game.game_id for game in games]
         with self._session_cm as scm:
-            for game in games:
-                scm.session.merge(game)
+            with catalog_counts.tracking_counts(scm.session, game_ids):
+                for game in games:
+                    scm.session.merge(game)
+                scm.session.flush()
+            catalog_search.refresh_search_rows(scm.session, game_ids)
+            catalog_version.bump_version(scm.session)
+            scm.commit()
+
+    def _bulk_upsert_games(self, games: List[Game]):
+        upsert = sqlite_insert(games_table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[games_table.c.game_id],
+            set_={column.name: upsert.excluded[column.name] for column in games_table.c if column.name != 'game_id'})
+        with self._session_cm as scm:
+            for start in range(0, len(games), self._batch_size):
+                batch = games[start:start + self._batch_size]
+                batch_ids = [game.game_id for game in batch]
+                with catalog_counts.tracking_counts(scm.session, batch_ids):
+                    scm.session.execute(upsert, [game_to_row(game) for game in batch])
+                    # Like merge, replace the genres of games that were already stored.
+                    scm.session.execute(game_genres_table.delete().where(game_genres_table.c.game_id.in_(batch_ids)))
+                    links = [{'game_id': game.game_id, 'genre_name': genre.genre_name}
+                             for game in batch for genre in game.genres]
+                    if links:
+                        scm.session.execute(game_genres_table.insert(), links)
+                catalog_search.refresh_search_rows(scm.session, batch_ids)
+            if games:
+                catalog_version.bump_version(scm.session)
             scm.commit()
 
     def add_multiple_publishers(self, publishers: List[Publisher]):
+        if self._bulk_load:
+            with self._session_cm as scm:
+                self._execute_in_batches(scm, sqlite_insert(publishers_table).on_conflict_do_nothing(),
+                                         [{'name': publisher.publisher_name} for publisher in publishers])
+                scm.commit()
+            return
         with self._session_cm as scm:
             for publisher in publishers:
                 scm.session.merge(publisher)
@@ -95,9 +163,30 @@ class SqlAlchemyRepository(AbstractRepository):
 
         return game
 
+    def get_game_details(self, game_id: int) -> Game:
+        return self._session_cm.session.query(Game).filter(Game._Game__game_id == game_id).options(
+            *detail_loading()).one_or_none()
+
+    def get_games_by_ids(self, game_ids, preserve_order: bool = True) -> List[Game]:
+        game_ids = list(game_ids)
+        if not game_ids:
+            return []
+        # One IN query for the games and their publishers, and one more for all of their genres.
+        games = self._session_cm.session.query(Game).filter(Game._Game__game_id.in_(set(game_ids))).options(
+            joinedload(Game._Game__publisher), selectinload(Game._Game__genres)).all()
+        if not preserve_order:
+            return games
+        games_by_id = {game.game_id: game for game in games}
+        return [games_by_id[game_id] for game_id in game_ids if game_id in games_by_id]
+
+    def get_games_page(self, limit: int, offset: int = 0, after_id: int = None) -> List[Game]:
+        query = self._session_cm.session.query(Game)
+        if after_id is not None:
+            query = query.filter(Game._Game__game_id > after_id)
+        return query.order_by(Game._Game__game_id).options(*listing_loading()).offset(offset).limit(limit).all()
+
     def get_number_of_games(self):
-        number_of_games = self._session_cm.session.query(Game).count()
-        return number_of_games
+        return catalog_counts.get_count(self._session_cm.session)
 
     def get_first_game(self):
         game = self._session_cm.session.query(Game).first()
@@ -111,13 +200,61 @@ class SqlAlchemyRepository(AbstractRepository):
         games = self._session_cm.session.query(Game).all()
         return games
 
-    def get_games_of_type(self, genre: Genre):
-        games = self._session_cm.session.query(Game).join(Game._Game__genres).filter(Genre._Genre__genre_name == genre).all()
+    def get_games_of_type(self, genre: Genre, offset: int = 0, limit: int = None, sort_by: str = 'id'):
+        if sort_by == 'id':
+            order = [games_table.c.game_id]
+        elif sort_by == 'title':
+            order = [games_table.c.game_title, games_table.c.game_id]
+        else:
+            raise ValueError(f"Games of a genre can only be sorted by one of {', '.join(GENRE_SORT_KEYS)}!")
+        # The genre only needs game_genres, whose (genre_name, game_id) index yields the genre's games.
+        games = self._session_cm.session.query(Game).join(
+            game_genres_table, game_genres_table.c.game_id == games_table.c.game_id).filter(
+            game_genres_table.c.genre_name == genre).order_by(*order).options(*listing_loading()).offset(
+            offset).limit(limit).all()
         return games
 
     def get_number_of_games_of_type(self, genre: Genre):
-        num_games = self._session_cm.session.query(Game).join(Game._Game__genres).filter(Genre._Genre__genre_name == genre).count()
-        return num_games
+        return catalog_counts.get_count(self._session_cm.session, genre)
+
+    def get_genre_counts(self):
+        return catalog_counts.get_genre_counts(self._session_cm.session)
+
+    def get_catalog_version(self):
+        return catalog_version.get_version(self._session_cm.session)
+
+    def find_games(self, sort_by: str = 'id', descending: bool = False, offset: int = 0, limit: int = None,
+                   genre: str = None, publisher: str = None, min_price: float = None, max_price: float = None,
+                   released_from: date = None, released_to: date = None):
+        sort_columns = {'id': None, 'title': games_table.c.game_title, 'price': games_table.c.game_price,
+                        'release': games_table.c.release_ordinal}
+        if sort_by not in sort_columns:
+            raise ValueError(f"Games can only be sorted by one of {', '.join(GAME_SORT_KEYS)}!")
+
+        query = self._session_cm.session.query(Game)
+        if genre is not None:
+            query = query.join(game_genres_table, game_genres_table.c.game_id == games_table.c.game_id).filter(
+                game_genres_table.c.genre_name == genre)
+        if publisher is not None:
+            query = query.filter(games_table.c.publisher_name == publisher)
+        if min_price is not None:
+            query = query.filter(games_table.c.game_price >= min_price)
+        if max_price is not None:
+            query = query.filter(games_table.c.game_price <= max_price)
+        if released_from is not None:
+            query = query.filter(games_table.c.release_ordinal >= released_from.toordinal())
+        if released_to is not None:
+            query = query.filter(games_table.c.release_ordinal <= released_to.toordinal())
+        count = query.order_by(None).count()
+
+        # Ties are broken by ascending id in both directions, as in the memory repository.
+        direction = desc if descending else asc
+        if sort_columns[sort_by] is None:
+            order = [direction(games_table.c.game_id)]
+        else:
+            order = [direction(sort_columns[sort_by]), games_table.c.game_id]
+        games = query.order_by(*order).options(*listing_loading()).offset(offset).limit(limit).all()
+        return count, games
 
     def get_genres(self) -> List[Genre]:
         genres = self._session_cm.session.query(Genre).all()
@@ -129,19 +266,30 @@ class SqlAlchemyRepository(AbstractRepository):
             scm.commit()
 
     def add_multiple_genres(self, genres: List[Genre]):
+        if self._bulk_load:
+            with self._session_cm as scm:
+                self._execute_in_batches(scm, sqlite_insert(genres_table).on_conflict_do_nothing(),
+                                         [{'genre_name': genre.genre_name} for genre in genres])
+                scm.commit()
+            return
         with self._session_cm as scm:
             for genre in genres:
                 scm.session.merge(genre)
             scm.commit()
 
-    def get_reviews(self, user_name) -> List[Review]:
-        comments = self._session_cm.session.query(Review).all()
+    def get_reviews(self, user: User, offset: int = 0, limit: int = None) -> List[Review]:
+        if user is None:
+            return []
+        # The profile page shows the reviewed games, so they are loaded along with the reviews.
+        comments = self._session_cm.session.query(Review).filter(Review._Review__user == user).order_by(
+            desc(reviews_table.c.review_id)).offset(offset).limit(limit).options(
+            selectinload(Review._Review__game)).all()
         return comments
 
     def get_wishlist_games(self, user: User) -> List[Game]:
-        wishlist_games = self._session_cm.session.query(Wishlist).filter_by(_Wishlist__user=user).all()
-        game_objects = [self.get_game_by_id(game.game_id) for game in wishlist_games]
-        return game_objects
+        game_ids = [game_id for game_id, in self._session_cm.session.query(Wishlist.game_id).filter_by(
+            _Wishlist__user=user).order_by(Wishlist.id)]
+        return self.get_games_by_ids(game_ids)
 
     def get_number_of_wishlist_games(self, user: User) -> List[Game]:
         num_games = self._session_cm.session.query(Wishlist).filter_by(_Wishlist__user=user).count()
@@ -152,25 +300,53 @@ class SqlAlchemyRepository(AbstractRepository):
     def add_review(self, review: Review):
         with self._session_cm as scm:
             scm.session.merge(review)
+            catalog_version.bump_version(scm.session)
             scm.commit()
 
     def add_multiple_reviews(self, reviews: List[Review]):
+        if self._bulk_load:
+            self._bulk_insert_reviews(reviews)
+            return
         with self._session_cm as scm:
             for review in reviews:
                 scm.session.merge(review)
+            if reviews:
+                catalog_version.bump_version(scm.session)
+            scm.commit()
+
+    def _bulk_insert_reviews(self, reviews: List[Review]):
+        rows = []
+        unsaved_reviews = []
+        for review in reviews:
+            # Rows can only be written for users that already have an id, the rest go through the session.
+            user_id = getattr(review.user, 'user_id', None)
+            if user_id is None:
+                unsaved_reviews.append(review)
+            else:
+                rows.append({'game_id': review.game.game_id, 'rating': review.rating, 'comment': review.comment,
+                             'user_id': user_id})
+        with self._session_cm as scm:
+            self._execute_in_batches(scm, reviews_table.insert(), rows)
+            for review in unsaved_reviews:
+                scm.session.merge(review)
+            if reviews:
+                catalog_version.bump_version(scm.session)
             scm.commit()
 
     # endregion
 
     def add_wishlist_game(self, game: Game, user: User):
-        wishlist = Wishlist(user)
-        wishlist._Wishlist__game_id = game
-
+        if game is None or user is None:
+            return
+        # The unique (user_id, game_id) index makes adding a game that is already on the wishlist a no-op.
         with self._session_cm as scm:
-            scm.session.merge(wishlist)
+            scm.session.execute(sqlite_insert(wishlist_table).values(
+                user_id=user.user_id, game_id=game.game_id).on_conflict_do_nothing())
             scm.commit()
 
     def remove_wishlist_game(self, game: Game, user: User):
+        if game is None or user is None:
+            return
         with self._session_cm as scm:
             # Retrieve the wishlist item based on the provided game and user
             wishlist_item = scm.session.query(Wishlist).filter_by(_Wishlist__user=user, _Wishlist__game_id=game).first()
@@ -179,23 +355,20 @@ class SqlAlchemyRepository(AbstractRepository):
                 scm.session.delete(wishlist_item)  # Remove the wishlist item from the session
                 scm.commit()  # Commit the changes to the database
 
-    def search_games(self, query):
-
-        search = "%{}%".format(query)
-
-        genre_count = self._session_cm.session.query(Game).join(Game._Game__genres).filter(
-            Genre._Genre__genre_name.like(search)).count()
-
-        # Searches for games of type genre.
-        genre_games = self._session_cm.session.query(Game).join(Game._Game__genres).filter(
-            Genre._Genre__genre_name.like(search)).all()
-        game_objects = [self.get_game_by_id(game.game_id) for game in genre_games]
-
-        # Searches for games with title.
-        if genre_count == 0:
-            selected_games = self._session_cm.session.query(Game).filter(Game._Game__game_title.like(search)).all()
-            game_objects = [self.get_game_by_id(game.game_id) for game in selected_games]
-
-        return game_objects
+    def search_games(self, query, limit: int = SEARCH_RESULT_LIMIT):
+        query = query.strip()
+        if len(query) < catalog_search.MIN_INDEXED_QUERY_LENGTH:
+            # Like the memory repository, a linear scan lists the titles containing a short query.
+            return self._session_cm.session.query(Game).filter(catalog_search.title_contains(query)).order_by(
+                games_table.c.game_title, games_table.c.game_id).options(*listing_loading()).limit(limit).all()
+        # Titles, genres, publishers and descriptions are matched through the FTS5 index, and the best-ranked
+        # games are loaded with the same query.
+        expression = catalog_search.match_expression(query)
+        if not expression:
+            return []
+        return self._session_cm.session.query(Game).join(
+            search_table, search_table.c.rowid == games_table.c.game_id).filter(
+            catalog_search.match_clause(expression)).order_by(
+            catalog_search.bm25_rank(), games_table.c.game_id).options(*listing_loading()).limit(limit).all()
 
 
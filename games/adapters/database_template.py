@@ -0,0 +1,102 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from games.adapters import catalog_delta, repository_populate
+from games.adapters.catalog_snapshot import csv_fingerprint
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.datareader.csvdatareader import DEFAULT_BATCH_SIZE
+from games.adapters.orm import metadata, SEARCH_TABLE_DDL
+
+
+def schema_fingerprint() -> str:
+    """ Returns the sha256 hash of the DDL of every table and index, so that schema changes retire old templates. """
+    dialect = sqlite.dialect()
+    sha256 = hashlib.sha256(SEARCH_TABLE_DDL.encode())
+    for table in metadata.sorted_tables:
+        sha256.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            sha256.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return sha256.hexdigest()
+
+
+def template_path(template_directory, data_path) -> Path:
+    """ Returns where the template database for the games csv file in data_path and the current schema lives. """
+    csv_path = Path(data_path) / "games.csv"
+    # A missing csv file is read as an empty catalog, so it shares the template of an empty file.
+    csv_hash = csv_fingerprint(csv_path)['sha256'] if csv_path.exists() else hashlib.sha256().hexdigest()
+    key = hashlib.sha256((csv_hash + schema_fingerprint()).encode()).hexdigest()[:16]
+    return Path(template_directory) / f"games-{key}.db"
+
+
+def build_template(data_path, path, batch_size: int = DEFAULT_BATCH_SIZE, max_workers: int = 1):
+    """ Creates a database at path holding the schema and the catalog of the games csv file in data_path.
+
+    The database is written next to path and moved into place once complete, so that a concurrent or interrupted
+    build never leaves a partial template behind. The domain model has to be mapped to the tables already.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if temporary_path.exists():
+        temporary_path.unlink()
+
+    engine = create_engine(f"sqlite:///{temporary_path}")
+    try:
+        metadata.create_all(engine)
+        repository = SqlAlchemyRepository(sessionmaker(bind=engine), bulk_load=True, batch_size=batch_size)
+        repository_populate.populate(data_path, repository, batch_size=batch_size, max_workers=max_workers)
+        repository.close_session()
+        session = sessionmaker(bind=engine)()
+        try:
+            catalog_delta.record_row_hashes(data_path, session)
+        finally:
+            session.close()
+    finally:
+        engine.dispose()
+    os.replace(temporary_path, path)
+
+
+def ensure_template(template_directory, data_path, batch_size: int = DEFAULT_BATCH_SIZE, max_workers: int = 1) -> Path:
+    """ Returns the template database for data_path, building it first if there is none for this csv and schema. """
+    path = template_path(template_directory, data_path)
+    if not path.exists():
+        build_template(data_path, path, batch_size=batch_size, max_workers=max_workers)
+    return path
+
+
+def clone_into_engine(path, engine):
+    """ Replaces the contents of the database behind engine with the template at path.
+
+    Uses SQLite's online backup API, which copies the template page by page through one of the engine's own
+    connections. That also works for in-memory databases, whose contents only exist within their connection.
+    """
+    connection = engine.raw_connection()
+    try:
+        # A sqlite3 connection used as a context manager only ends a transaction, it is not closed.
+        with contextlib.closing(sqlite3.connect(path)) as template:
+            template.backup(connection.dbapi_connection)
+    finally:
+        connection.close()
+
+
+def clone_to_file(path, destination):
+    """ Copies the template at path to a new database file at destination, e.g. to provision a staging instance.
+
+    The copy is written next to destination and then moved into place, replacing any database that is there.
+    """
+    destination = Path(destination)
+    temporary_path = destination.with_name(f"{destination.name}.{os.getpid()}.tmp")
+    shutil.copyfile(path, temporary_path)
+    # A write-ahead log left by the replaced database would be applied to the copy.
+    for suffix in ('-wal', '-shm'):
+        destination.with_name(destination.name + suffix).unlink(missing_ok=True)
+    os.replace(temporary_path, destination)
@@ -1,7 +1,93 @@
 import csv
+import io
 import os
-
-from games.domainmodel.model import Genre, Game, Publisher
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Tuple
+
+from games.domainmodel.model import Genre, Game, Publisher, intern_genre, intern_publisher
+
+# Number of games handed to the repository at a time when streaming the csv file.
+DEFAULT_BATCH_SIZE = 500
+
+# Number of byte ranges handed to each worker process when parsing in parallel, so that
+# a slow chunk does not leave the other workers idle.
+CHUNKS_PER_WORKER = 4
+
+
+class GameBatch(NamedTuple):
+    """ A slice of the csv file, together with the publishers and genres first seen in it. """
+    games: List[Game]
+    publishers: List[Publisher]
+    genres: List[Genre]
+
+
+def build_game(row: dict) -> Game:
+    """ Builds a Game from a csv row, raising ValueError or KeyError if the row is invalid. """
+    game_id = int(row["AppID"])
+    title = row["Name"]
+    game = Game(game_id, title)
+    game.release_date = row["Release date"]
+    game.price = float(row["Price"])
+    game.description = row["About the game"]
+    game.image_url = row["Header image"]
+    game.website_url = row["Website"]
+    game.publisher = intern_publisher(row["Publishers"])
+
+    genre_names = row["Genres"].split(",")
+    for genre_name in genre_names:
+        game.add_genre(intern_genre(genre_name.strip()))
+
+    return game
+
+
+def _parse_rows(rows) -> List[Game]:
+    games = []
+    for row in rows:
+        try:
+            games.append(build_game(row))
+        except ValueError as e:
+            print(f"Skipping row due to invalid data: {e}")
+        except KeyError as e:
+            print(f"Skipping row due to missing key: {e}")
+    return games
+
+
+def _parse_chunk(filename: str, fieldnames: List[str], start: int, end: int) -> List[Game]:
+    # Runs in a worker process: parses the records stored between two record boundaries.
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    return _parse_rows(csv.DictReader(text, fieldnames=fieldnames))
+
+
+def find_record_boundaries(filename: str, chunk_count: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """ Splits the data records of the csv file into at most chunk_count byte ranges.
+
+    Quoted fields may contain line breaks, so a line only ends a record when it closes every quote
+    opened so far. Returns the header fieldnames and the (start, end) offset of each range.
+    """
+    with open(filename, 'rb') as file:
+        header = file.readline()
+        fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+        data_start = file.tell()
+        data_end = file.seek(0, os.SEEK_END)
+        file.seek(data_start)
+
+        target_size = max(1, (data_end - data_start) // max(1, chunk_count))
+        ranges = []
+        start = position = data_start
+        quotes = 0
+        for line in file:
+            position += len(line)
+            quotes += line.count(b'"')
+            if quotes % 2 == 0 and position - start >= target_size:
+                ranges.append((start, position))
+                start = position
+        if position > start:
+            ranges.append((start, position))
+
+    return fieldnames, ranges
 
 
 class GameFileCSVReader:
@@ -10,40 +96,89 @@ class GameFileCSVReader:
         self.__dataset_of_games = []
         self.__dataset_of_publishers = set()
         self.__dataset_of_genres = set()
-
-    def read_csv_file(self):
+        # The first instance seen of each publisher and genre, keyed by itself.
+        self.__known_publishers = dict()
+        self.__known_genres = dict()
+        # Only the first valid row of an AppID is kept, whichever batch the later rows end up in.
+        self.__seen_game_ids = set()
+
+    def read_csv_file(self, max_workers: int = 1):
+        if max_workers > 1:
+            batches = self.read_csv_file_in_parallel(max_workers)
+        else:
+            batches = self.read_csv_file_in_batches()
+        for batch in batches:
+            self.__dataset_of_games.extend(batch.games)
+
+    def read_csv_file_in_batches(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[GameBatch]:
+        """ Lazily parses the csv file, yielding batches of at most batch_size games.
+
+        Each publisher and genre is only yielded with the first batch that references it, so that
+        a consumer can store them before the games of that batch. Only the first valid row of an AppID
+        is yielded as a game.
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be a positive integer!")
         if not os.path.exists(self.__filename):
             print(f"path {self.__filename} does not exist!")
             return
         with open(self.__filename, 'r', encoding='utf-8-sig') as file:
             reader = csv.DictReader(file)
+            rows = []
             for row in reader:
-                try:
-                    game_id = int(row["AppID"])
-                    title = row["Name"]
-                    game = Game(game_id, title)
-                    game.release_date = row["Release date"]
-                    game.price = float(row["Price"])
-                    game.description = row["About the game"]
-                    game.image_url = row["Header image"]
-                    game.website_url = row["Website"]
-
-                    publisher = Publisher(row["Publishers"])
-                    self.__dataset_of_publishers.add(publisher)
-                    game.publisher = publisher
-
-                    genre_names = row["Genres"].split(",")
-                    for genre_name in genre_names:
-                        genre = Genre(genre_name.strip())
-                        self.__dataset_of_genres.add(genre)
-                        game.add_genre(genre)
-
-                    self.__dataset_of_games.append(game)
-
-                except ValueError as e:
-                    print(f"Skipping row due to invalid data: {e}")
-                except KeyError as e:
-                    print(f"Skipping row due to missing key: {e}")
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    yield self.__merge(_parse_rows(rows))
+                    rows = []
+            if rows:
+                yield self.__merge(_parse_rows(rows))
+
+    def read_csv_file_in_parallel(self, max_workers: int = None) -> Iterator[GameBatch]:
+        """ Parses byte ranges of the csv file in worker processes, yielding one batch per range.
+
+        Batches are yielded in file order whatever order the workers finish in, and publishers and
+        genres are deduplicated across batches in the same way as read_csv_file_in_batches.
+        """
+        if not os.path.exists(self.__filename):
+            print(f"path {self.__filename} does not exist!")
+            return
+        max_workers = max_workers or os.cpu_count() or 1
+        fieldnames, ranges = find_record_boundaries(self.__filename, max_workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunks = executor.map(_parse_chunk, [self.__filename] * len(ranges), [fieldnames] * len(ranges),
+                                  [start for start, _ in ranges], [end for _, end in ranges])
+            for games in chunks:
+                if games:
+                    yield self.__merge(games)
+
+    def __merge(self, games: List[Game]) -> GameBatch:
+        # Swap each game's publisher and genres for the first equal instance seen, so that all games
+        # share one object per publisher and genre, and record which of them are new to this batch.
+        batch = GameBatch([], [], [])
+        known_publishers = self.__known_publishers
+        known_genres = self.__known_genres
+        seen_game_ids = self.__seen_game_ids
+        for game in games:
+            if game.game_id in seen_game_ids:
+                print(f"Skipping duplicate row for game {game.game_id}")
+                continue
+            seen_game_ids.add(game.game_id)
+            batch.games.append(game)
+
+            publisher = game.publisher
+            if publisher not in known_publishers:
+                known_publishers[publisher] = publisher
+                self.__dataset_of_publishers.add(publisher)
+                batch.publishers.append(publisher)
+            game.publisher = known_publishers[publisher]
+
+            for index, genre in enumerate(game.genres):
+                if genre not in known_genres:
+                    known_genres[genre] = genre
+                    self.__dataset_of_genres.add(genre)
+                    batch.genres.append(genre)
+                game.genres[index] = known_genres[genre]
+        return batch
 
     def get_unique_games_count(self):
         return len(self.__dataset_of_games)
@@ -65,9 +200,3 @@ class GameFileCSVReader:
     @property
     def dataset_of_genres(self) -> set:
         return self.__dataset_of_genres
-
-
-
-
-
-
@@ -1,9 +1,26 @@
-from games.adapters.repository import AbstractRepository
+from games.adapters.repository import AbstractRepository, GENRE_SORT_KEYS, GAME_SORT_KEYS, SEARCH_RESULT_LIMIT
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.adapters.catalog_columns import ColumnarCatalog
+from games.adapters.title_index import TitleTrigramIndex, normalize_title
 from games.domainmodel.model import Game, User, Review, Wishlist
-from games.domainmodel.model import Genre
+from games.domainmodel.model import Genre, Publisher
 import os.path
+from datetime import datetime, timezone
 import bisect
+from uuid import uuid4
+from itertools import islice
+from operator import attrgetter
+
+# Titles within this edit distance of a search query are returned as fuzzy matches.
+SIMILARITY_THRESHOLD = 3
+
+# Sorting on the id directly is equivalent to Game.__lt__, without a Python-level comparison per step.
+game_sort_key = attrgetter('game_id')
+
+
+def title_sort_key(game: Game):
+    # Ties between equal titles are broken by id, as in SQL.
+    return game.title or "", game.game_id
 
 
 def calculate_similarity(str1, str2):
@@ -25,81 +42,277 @@ def calculate_similarity(str1, str2):
     return dp[len_str1][len_str2]
 
 
+def bounded_similarity(str1, str2, max_distance: int) -> int:
+    """ Returns the edit distance between str1 and str2 if it is at most max_distance, else max_distance + 1.
+
+    Only the diagonal band of width 2 * max_distance + 1 can hold distances within the bound, so just that band
+    is filled, two rows at a time, and the comparison stops as soon as a whole row exceeds the bound.
+    """
+    len_str1 = len(str1)
+    len_str2 = len(str2)
+    too_far = max_distance + 1
+    if abs(len_str1 - len_str2) > max_distance:
+        return too_far
+
+    previous = [j if j <= max_distance else too_far for j in range(len_str2 + 1)]
+    current = [too_far] * (len_str2 + 1)
+    for i in range(1, len_str1 + 1):
+        low = max(1, i - max_distance)
+        high = min(len_str2, i + max_distance)
+        # The cells just outside the band are unreachable within the bound.
+        current[low - 1] = i if low == 1 and i <= max_distance else too_far
+        if high < len_str2:
+            current[high + 1] = too_far
+        row_minimum = current[low - 1]
+        char1 = str1[i - 1]
+        for j in range(low, high + 1):
+            if char1 == str2[j - 1]:
+                distance = previous[j - 1]
+            else:
+                distance = 1 + min(previous[j - 1], previous[j], current[j - 1])
+            if distance > too_far:
+                distance = too_far
+            current[j] = distance
+            if distance < row_minimum:
+                row_minimum = distance
+        if row_minimum > max_distance:
+            return too_far
+        previous, current = current, previous
+
+    return min(previous[len_str2], too_far)
+
+
 class MemoryRepository(AbstractRepository):
 
     def __init__(self):
         self.__games = list()
-        self.__users = list()
+        # Constant-time lookups: game_id -> Game, kept in step with the sorted games list, and username -> User.
+        self.__games_by_id = dict()
+        self.__users_by_name = dict()
+        # genre_name -> games of that genre, sorted like the games list. Built from each game's genres when it is added.
+        self.__games_by_genre = dict()
+        # Bulk loads append runs of sorted games and leave merging them to the next read, so that a load made of
+        # many batches is sorted once overall rather than once per batch.
+        self.__games_need_sorting = False
+        self.__genres_needing_sorting = set()
+        # genre_name -> games of that genre sorted by title, built on first use and dropped when the genre changes.
+        self.__games_by_genre_by_title = dict()
+        # descending -> all games sorted by title, built on first use and dropped whenever games are added.
+        self.__games_by_title = dict()
+        # Lower-cased titles and their trigrams, so that searches only look at games that can match.
+        self.__title_index = TitleTrigramIndex()
+        # Typed columns of the attributes games are filtered and sorted on, one row per game.
+        self.__catalog = ColumnarCatalog()
+        # username -> that user's reviews, oldest first.
+        self.__reviews_by_user = dict()
         self.__reviews = list()
         self.__wishlist = list()
+        self.__genres = set()
+        self.__publishers = set()
+        # Bumped by every write to the games or their reviews, see get_catalog_version.
+        self.__catalog_version = 0
+        self.__catalog_modified_at = None
+        # The version only counts the writes to this repository, so it is told apart from those of other processes.
+        self.__catalog_token = uuid4().hex
+
+    def __bump_catalog_version(self):
+        self.__catalog_version += 1
+        self.__catalog_modified_at = datetime.now(timezone.utc)
 
     def add_game(self, game: Game):
-        if isinstance(game, Game):
-            bisect.insort_left(self.__games, game)
+        # Like users, the first game added under an id keeps it.
+        if isinstance(game, Game) and game.game_id not in self.__games_by_id:
+            # The catalog goes first, so that a game it rejects is not left half added to the other indexes.
+            self.__catalog.append(game)
+            bisect.insort_left(self.__sorted_games(), game)
+            self.__games_by_title.clear()
+            self.__games_by_id[game.game_id] = game
+            self.__title_index.add(game.game_id, game.title)
+            for genre in game.genres:
+                self.__games_by_genre.setdefault(genre.genre_name, [])
+                self.__games_by_genre_by_title.pop(genre.genre_name, None)
+                bisect.insort_left(self.__sorted_games_of_type(genre.genre_name), game)
+            self.__bump_catalog_version()
 
-    def get_games(self) -> list[Game]:
+    def add_multiple_games(self, games):
+        # Sort the new games once and append them as a run. The next read merges the runs (see __sorted_games),
+        # instead of each game being inserted into the middle of the list.
+        # As in add_game, games whose id is already taken, by a stored game or an earlier one here, are skipped.
+        new_games_by_id = dict()
+        for game in games:
+            if isinstance(game, Game) and game.game_id not in self.__games_by_id:
+                new_games_by_id.setdefault(game.game_id, game)
+        new_games = sorted(new_games_by_id.values(), key=game_sort_key)
+        if not new_games:
+            return
+        self.__catalog.extend(new_games)
+        self.__games.extend(new_games)
+        self.__games_need_sorting = True
+        self.__games_by_title.clear()
+
+        new_games_by_genre = dict()
+        for game in new_games:
+            self.__games_by_id[game.game_id] = game
+            self.__title_index.add(game.game_id, game.title)
+            for genre in game.genres:
+                new_games_by_genre.setdefault(genre.genre_name, []).append(game)
+        for genre_name, genre_games in new_games_by_genre.items():
+            games_of_genre = self.__games_by_genre.setdefault(genre_name, [])
+            games_of_genre.extend(genre_games)
+            self.__genres_needing_sorting.add(genre_name)
+            self.__games_by_genre_by_title.pop(genre_name, None)
+        self.__bump_catalog_version()
+
+    def __sorted_games(self) -> list:
+        if self.__games_need_sorting:
+            # Sorting into a new list keeps the old one intact for any reader that is still iterating over it.
+            self.__games = sorted(self.__games, key=game_sort_key)
+            self.__games_need_sorting = False
         return self.__games
 
+    def __sorted_games_by_title(self, descending: bool) -> list:
+        games = self.__games_by_title.get(descending)
+        if games is None:
+            # Sorted from the id order, and the sort is stable, so equal titles stay in ascending id order.
+            games = sorted(self.__sorted_games(), key=lambda game: game.title or "", reverse=descending)
+            self.__games_by_title[descending] = games
+        return games
+
+    def __sorted_games_of_type(self, genre_name) -> list:
+        if genre_name in self.__genres_needing_sorting:
+            self.__games_by_genre[genre_name] = sorted(self.__games_by_genre[genre_name], key=game_sort_key)
+            self.__genres_needing_sorting.discard(genre_name)
+        return self.__games_by_genre.get(genre_name, [])
+
+    def add_multiple_genres(self, genres):
+        self.__genres.update(genre for genre in genres if isinstance(genre, Genre))
+
+    def add_multiple_publishers(self, publishers):
+        self.__publishers.update(publisher for publisher in publishers if isinstance(publisher, Publisher))
+
+    def get_games(self) -> list[Game]:
+        return self.__sorted_games()
+
+    def get_games_page(self, limit: int, offset: int = 0, after_id: int = None):
+        games = self.__sorted_games()
+        start = offset
+        if after_id is not None:
+            start += bisect.bisect_right(games, after_id, key=game_sort_key)
+        return games[start:start + limit]
+
     def get_number_of_games(self):
         return len(self.__games)
 
-    def get_games_of_type(self, genre):
-        return self.__games
+    def get_games_of_type(self, genre, offset: int = 0, limit: int = None, sort_by: str = 'id'):
+        if sort_by == 'id':
+            games = self.__sorted_games_of_type(genre)
+        elif sort_by == 'title':
+            games = self.__games_by_genre_by_title.get(genre)
+            if games is None:
+                games = sorted(self.__sorted_games_of_type(genre), key=title_sort_key)
+                self.__games_by_genre_by_title[genre] = games
+        else:
+            raise ValueError(f"Games of a genre can only be sorted by one of {', '.join(GENRE_SORT_KEYS)}!")
+        end = None if limit is None else offset + limit
+        return games[offset:end]
 
     def get_number_of_games_of_type(self, genre):
-        games_list = []
-        genre_to_find = Genre(genre)
-        for game in self.__games:
-            for genre_current in game.genres:
-                if genre_to_find == genre_current:
-                    games_list.append(game)
-        return len(games_list)
+        return len(self.__games_by_genre.get(genre, []))
+
+    def get_catalog_version(self):
+        return self.__catalog_version, self.__catalog_modified_at
+
+    @property
+    def catalog_token(self):
+        return self.__catalog_token
+
+    def get_genre_counts(self):
+        return [(genre_name, len(games)) for genre_name, games in sorted(self.__games_by_genre.items()) if games]
+
+    def find_games(self, sort_by: str = 'id', descending: bool = False, offset: int = 0, limit: int = None,
+                   **filters):
+        """ Returns the number of games matching the filters and one page of them.
+
+        Filtering and sorting run over the columnar catalog, and only the games on the page are looked up.
+        Titles are not in the catalog, so a title sort walks a cached title order of all games instead and
+        keeps the matching ones. See ColumnarCatalog.query for the filters.
+        """
+        if sort_by not in GAME_SORT_KEYS:
+            raise ValueError(f"Games can only be sorted by one of {', '.join(GAME_SORT_KEYS)}!")
+        if sort_by != 'title':
+            count, game_ids = self.__catalog.query(sort_by, descending, offset, limit, **filters)
+            return count, [self.__games_by_id[game_id] for game_id in game_ids]
+
+        count, game_ids = self.__catalog.query(**filters)
+        games = self.__sorted_games_by_title(descending)
+        if count < len(games):
+            matching_ids = set(game_ids)
+            games = (game for game in games if game.game_id in matching_ids)
+        end = None if limit is None else offset + limit
+        return count, list(islice(games, offset, end))
 
     def get_game_by_id(self, game_id):
-        for game in self.__games:
-            if game.game_id == game_id:
-                return game
-        return None
+        return self.__games_by_id.get(game_id)
 
-    def search_games(self, query):
-        query = query.lower()
+    def get_games_by_ids(self, game_ids, preserve_order: bool = True):
+        games_by_id = self.__games_by_id
+        return [games_by_id[game_id] for game_id in game_ids if game_id in games_by_id]
+
+    def search_games(self, query, limit: int = SEARCH_RESULT_LIMIT):
+        query = normalize_title(query)
         results = []
         exact_match = None
         substrings = []
 
-        for game in self.__games:
-            if query == game.title.lower():
-                exact_match = game
-            elif query in game.title.lower():
-                substrings.append(game)
-            else:
-                similarity = calculate_similarity(query, game.title.lower())
-                similarity_threshold = 3
-
-                if similarity <= similarity_threshold:
-                    results.append(game)
+        # Candidates come from the title index and are checked in id order, as a scan of the games would.
+        # Queries shorter than a trigram get every title as a candidate, so they are matched by a linear scan.
+        title_index = self.__title_index
+        matched_ids = set()
+        for game_id in sorted(title_index.substring_candidates(query)):
+            title = title_index.title(game_id)
+            if query == title:
+                exact_match = self.__games_by_id[game_id]
+                matched_ids.add(game_id)
+            elif query in title:
+                substrings.append(self.__games_by_id[game_id])
+                matched_ids.add(game_id)
+        for game_id in sorted(title_index.fuzzy_candidates(query, SIMILARITY_THRESHOLD) - matched_ids):
+            if bounded_similarity(query, title_index.title(game_id), SIMILARITY_THRESHOLD) <= SIMILARITY_THRESHOLD:
+                results.append(self.__games_by_id[game_id])
 
         substrings = sorted(substrings, key=lambda game: game.title)
         results = sorted(results, key=lambda game: game.title)
         results = substrings + results
         if exact_match is not None:
             results.insert(0, exact_match)
-        return results
+        return results[:limit]
 
     def add_user(self, user: User):
-        self.__users.append(user)
+        # The first user added under a name keeps it.
+        self.__users_by_name.setdefault(user.username, user)
 
     def get_user(self, user_name) -> User:
-        return next((user for user in self.__users if user.username == user_name), None)
+        return self.__users_by_name.get(user_name)
 
-    def get_reviews(self, user: User):
-        reviews = [x for x in self.__reviews if x.user == user]
-        return reviews[::-1]
+    def get_reviews(self, user: User, offset: int = 0, limit: int = None):
+        if user is None:
+            return []
+        reviews = self.__reviews_by_user.get(user.username, [])
+        # Slice from the end of the list, so that only the requested reviews are copied.
+        end = max(0, len(reviews) - offset)
+        start = 0 if limit is None else max(0, end - limit)
+        return reviews[start:end][::-1]
 
     def add_review(self, review: Review):
         # call parent class first, add_review relies on implementation of code common to all derived classes
         super().add_review(review)
         self.__reviews.append(review)
+        self.__reviews_by_user.setdefault(review.user.username, []).append(review)
+        self.__bump_catalog_version()
+
+    def add_multiple_reviews(self, reviews):
+        for review in reviews:
+            self.add_review(review)
 
     def get_number_of_wishlist_games(self, user: User):
         """returns a number of wishlist games in the repository"""
@@ -111,12 +324,12 @@ class MemoryRepository(AbstractRepository):
 
     def add_wishlist_game(self, game: Game, user: User):
         """Adds a wishlist game to the repository"""
-        if game not in user.favourite_games:
+        if game is not None and user is not None and game not in user.favourite_games:
             user.add_favourite_game(game)
 
     def remove_wishlist_game(self, game: Game, user: User):
         """Removes a wishlist game from the repository"""
-        if game in user.favourite_games:
+        if game is not None and user is not None and game in user.favourite_games:
             user.remove_favourite_game(game)
 
 
@@ -125,9 +338,7 @@ def populate(repo: AbstractRepository, csv_path="data/games.csv"):
     games_file_name = os.path.join(dir_name, csv_path)
     reader = GameFileCSVReader(games_file_name)
 
-    reader.read_csv_file()
-
-    games = reader.dataset_of_games
-
-    for game in games:
-        repo.add_game(game)
+    for batch in reader.read_csv_file_in_batches():
+        repo.add_multiple_publishers(batch.publishers)
+        repo.add_multiple_genres(batch.genres)
+        repo.add_multiple_games(batch.games)
@@ -1,9 +1,9 @@
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Text, Float, ForeignKey
+    Table, MetaData, Column, Integer, String, Text, Float, ForeignKey, DDL, Index, event
 )
-from sqlalchemy.orm import mapper, relationship
+from sqlalchemy.orm import mapper, relationship, clear_mappers
 
-from games.domainmodel.model import Game, Publisher, Genre, User, Review, Wishlist
+from games.domainmodel.model import Game, Publisher, Genre, User, Review, Wishlist, clear_interned, restore_slots
 
 # global variable giving access to the MetaData (schema) information of the database
 metadata = MetaData()
@@ -18,9 +18,12 @@ publishers_table = Table(
 games_table = Table(
     'games', metadata,
     Column('game_id', Integer, primary_key=True),
-    Column('game_title', Text, nullable=False),
-    Column('game_price', Float, nullable=False),
+    # Title listings are read in order from this index, which ends in the game_id that breaks ties between titles.
+    Column('game_title', Text, nullable=False, index=True),
+    Column('game_price', Float, nullable=False, index=True),
     Column('release_date', String(50), nullable=False),
+    # release_date parsed to a proleptic Gregorian ordinal, so that games can be sorted and filtered by date.
+    Column('release_ordinal', Integer, nullable=True, index=True),
     Column('game_description', String(255), nullable=True),
     Column('game_image_url', String(255), nullable=True),
     Column('game_website_url', String(255), nullable=True),
@@ -31,26 +34,31 @@ game_genres_table = Table('game_genres', metadata,
                           Column('id', Integer, primary_key=True, autoincrement=True),
                           Column('game_id', ForeignKey('games.game_id')),
                           Column('genre_name', ForeignKey('genres.genre_name')),
+                          # Genre pages list a genre's games by id straight from this index.
+                          Index('ix_game_genres_genre_name_game_id', 'genre_name', 'game_id'),
+                          Index('ix_game_genres_game_id', 'game_id'),
                           )
 
 users_table = Table('users', metadata,
                     Column('user_id', Integer, primary_key=True, autoincrement=True),
-                    Column('username', String(64), nullable=False),
+                    Column('username', String(64), nullable=False, index=True),
                     Column('password', String(64), nullable=False)
                     )
 
 wishlist_table = Table('wishlist', metadata,
                        Column('id', Integer, primary_key=True, autoincrement=True),
                        Column('user_id', ForeignKey('users.user_id')),
-                       Column('game_id', ForeignKey('games.game_id'))
+                       Column('game_id', ForeignKey('games.game_id'), index=True),
+                       # A game is on a user's wishlist at most once. The index also serves lookups by user.
+                       Index('uq_wishlist_user_id_game_id', 'user_id', 'game_id', unique=True),
                        )
 
 reviews_table = Table('reviews', metadata,
                       Column('review_id', Integer, primary_key=True, autoincrement=True),
-                      Column('game_id', Integer, ForeignKey('games.game_id')),
+                      Column('game_id', Integer, ForeignKey('games.game_id'), index=True),
                       Column('rating', Integer, nullable=False),
                       Column('comment', String(64), nullable=True),
-                      Column('user_id', ForeignKey('users.user_id'))
+                      Column('user_id', ForeignKey('users.user_id'), index=True)
                       )
 
 genres_table = Table(
@@ -59,8 +67,66 @@ genres_table = Table(
     Column('genre_name', String(64), primary_key=True, nullable=False)
 )
 
+# Hash of the csv row each game was last loaded from, used to apply catalog changes incrementally.
+# Not mapped to the domain model.
+catalog_hashes_table = Table(
+    'catalog_hashes', metadata,
+    Column('game_id', Integer, primary_key=True),
+    Column('row_hash', String(64), nullable=False)
+)
+
+# Number of games per genre, adjusted by every write to the catalog so that counts are single-row lookups.
+# The row with an empty genre_name holds the number of games in the whole catalog.
+genre_counts_table = Table(
+    'genre_counts', metadata,
+    Column('genre_name', String(64), primary_key=True),
+    Column('game_count', Integer, nullable=False)
+)
+
+# Single row counting the writes to the games and their reviews, so that pages rendered from them can be
+# validated and cached. modified_at is the time of the last of those writes in seconds since the epoch.
+catalog_version_table = Table(
+    'catalog_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('modified_at', Float, nullable=False)
+)
+
+# SQLite FTS5 index over the searchable text of each game, keyed by rowid = game_id. Virtual tables cannot be
+# created from a Table definition, so it lives outside metadata and is created and dropped along with it.
+search_table = Table(
+    'games_search', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    Column('title', Text),
+    Column('genres', Text),
+    Column('publisher', Text),
+    Column('description', Text)
+)
+
+SEARCH_TABLE_DDL = ("CREATE VIRTUAL TABLE IF NOT EXISTS games_search "
+                    "USING fts5(title, genres, publisher, description, tokenize = 'unicode61 remove_diacritics 2')")
+event.listen(metadata, 'after_create', DDL(SEARCH_TABLE_DDL).execute_if(dialect='sqlite'))
+event.listen(metadata, 'before_drop', DDL("DROP TABLE IF EXISTS games_search").execute_if(dialect='sqlite'))
+
+
+def game_to_row(game) -> dict:
+    """ Returns the values of the games_table row of a game, for writes that bypass the mapper. """
+    return {
+        'game_id': game.game_id,
+        'game_title': game.title,
+        'game_price': game.price,
+        'release_date': game.release_date,
+        'release_ordinal': game.release_ordinal,
+        'game_description': game.description,
+        'game_image_url': game.image_url,
+        'game_website_url': game.website_url,
+        'publisher_name': game.publisher.publisher_name if game.publisher else None,
+    }
+
 
 def map_model_to_tables():
+    # Shared genres and publishers created before mapping lack instrumentation and cannot be stored.
+    clear_interned()
     mapper(Publisher, publishers_table, properties={
         '_Publisher__publisher_name': publishers_table.c.name,
     })
@@ -81,6 +147,7 @@ def map_model_to_tables():
         '_Game__game_title': games_table.c.game_title,
         '_Game__price': games_table.c.game_price,
         '_Game__release_date': games_table.c.release_date,
+        '_Game__release_ordinal': games_table.c.release_ordinal,
         '_Game__description': games_table.c.game_description,
         '_Game__image_url': games_table.c.game_image_url,
         '_Game__website_url': games_table.c.game_website_url,
@@ -101,3 +168,9 @@ def map_model_to_tables():
         '_Wishlist__user': relationship(User, back_populates='_User__wishlist'),
         '_Wishlist__game_id': relationship(Game)
     })
+
+
+def clear_model_mappers():
+    """ Unmaps the domain model, so that new instances store their fields in slots again. """
+    clear_mappers()
+    restore_slots()
@@ -1,9 +1,19 @@
 import abc
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional, Tuple
 from games.domainmodel.model import Game, Publisher, Genre, Review, User, Wishlist
 
 repo_instance = None
 
+# Orders in which get_games_of_type can return the games of a genre.
+GENRE_SORT_KEYS = ('id', 'title')
+
+# Orders in which find_games can return games. 'release' sorts by release date.
+GAME_SORT_KEYS = ('id', 'title', 'price', 'release')
+
+# Most games a search returns, best matches first.
+SEARCH_RESULT_LIMIT = 50
+
 
 class RepositoryException(Exception):
     def __init__(self, message=None):
@@ -22,14 +32,24 @@ class AbstractRepository(abc.ABC):
         """Returns the list of games"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_games_page(self, limit: int, offset: int = 0, after_id: int = None) -> List[Game]:
+        """ Returns at most limit games in id order, skipping the first offset games.
+
+        With after_id only games with a larger id are considered, so that the next page can be found from the
+        last game of the previous one (keyset pagination) instead of counting past all the earlier games.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_number_of_games(self):
         """returns a number of games exist in the repository"""
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_games_of_type(self, genre: str):
-        """returns all games of same genre type"""
+    def get_games_of_type(self, genre: str, offset: int = 0, limit: int = None, sort_by: str = 'id'):
+        """returns the games of same genre type sorted by one of GENRE_SORT_KEYS (ties by id), skipping the first
+        offset games and returning at most limit. Raises ValueError for any other sort key."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -37,6 +57,52 @@ class AbstractRepository(abc.ABC):
         """returns total number of games that exist with genre"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def find_games(self, sort_by: str = 'id', descending: bool = False, offset: int = 0, limit: int = None,
+                   genre: str = None, publisher: str = None, min_price: float = None, max_price: float = None,
+                   released_from: date = None, released_to: date = None) -> Tuple[int, List[Game]]:
+        """ Returns the number of games matching the filters and one page of them, sorted by one of GAME_SORT_KEYS.
+
+        All filters are inclusive and ignored when None. Games with equal sort keys are in ascending id order,
+        also when descending is set. Raises ValueError for an unknown sort key.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_genre_counts(self) -> List[Tuple[str, int]]:
+        """ Returns (genre name, number of games) for every genre that has games, ordered by genre name. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_catalog_version(self) -> Tuple[int, Optional[datetime]]:
+        """ Returns a counter that grows with every write to the games or their reviews, and the UTC time of the
+        last such write, or (0, None) before the first. Pages rendered from the catalog are valid as long as the
+        version is unchanged.
+        """
+        raise NotImplementedError
+
+    @property
+    def catalog_token(self) -> str:
+        """ Tells apart the stores whose versions are counted separately. Repositories whose version restarts
+        from 0 when they are created return a token of their own, so that their versions cannot be confused.
+        """
+        return ""
+
+    def get_game_details(self, game_id: int) -> Game:
+        """ Returns the game with game_id, prepared for its detail page, or None if there is no such game.
+
+        Repositories that load relationships lazily override this to load everything the page shows at once.
+        """
+        return self.get_game_by_id(game_id)
+
+    @abc.abstractmethod
+    def get_games_by_ids(self, game_ids, preserve_order: bool = True) -> List[Game]:
+        """ Returns the games with the given ids in one go, leaving out ids of games that do not exist.
+
+        The games are in the order of game_ids if preserve_order is set, and in no particular order otherwise.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_user(self, user: User):
         """" Adds a User to the repository. """
@@ -103,11 +169,11 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_reviews(self, user_name) -> List[Review]:
-        """ Returns all reviews """
+    def get_reviews(self, user: User, offset: int = 0, limit: int = None) -> List[Review]:
+        """ Returns the reviews written by user, newest first, skipping the first offset and returning at most limit """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def search_games(self, query) -> List[Game]:
-        """ Returns all games with query """
+    def search_games(self, query, limit: int = SEARCH_RESULT_LIMIT) -> List[Game]:
+        """ Returns the games that best match query, at most limit of them """
         raise NotImplementedError
@@ -2,26 +2,51 @@ import os
 from pathlib import Path
 
 from games.adapters.repository import AbstractRepository
-from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.adapters.datareader.csvdatareader import GameFileCSVReader, GameBatch, DEFAULT_BATCH_SIZE
+from games.adapters import catalog_snapshot
 
 
-def populate(data_path: Path, repo: AbstractRepository):
+def populate(data_path: Path, repo: AbstractRepository, batch_size: int = DEFAULT_BATCH_SIZE, max_workers: int = 1):
 
     games_file_name = str(Path(data_path) / "games.csv")
 
     reader = GameFileCSVReader(games_file_name)
 
-    reader.read_csv_file()
+    # Stream the csv file so that only one batch of games is held at a time, and the games
+    # of each batch are available from the repo before the rest of the file is parsed.
+    # With more than one worker, byte ranges of the file are parsed in separate processes instead.
+    if max_workers > 1:
+        batches = reader.read_csv_file_in_parallel(max_workers)
+    else:
+        batches = reader.read_csv_file_in_batches(batch_size)
 
-    publishers = reader.dataset_of_publishers
-    games = reader.dataset_of_games
-    genres = reader.dataset_of_genres
+    for batch in batches:
+        # Add publishers to the repo
+        repo.add_multiple_publishers(batch.publishers)
 
-    # Add publishers to the repo
-    repo.add_multiple_publishers(publishers)
+        # Add genres to the repo
+        repo.add_multiple_genres(batch.genres)
 
-    # Add genres to the repo
-    repo.add_multiple_genres(genres)
+        # Add games to the repo
+        repo.add_multiple_games(batch.games)
 
-    # Add games to the repo
-    repo.add_multiple_games(games)
+
+def populate_from_snapshot(data_path: Path, repo: AbstractRepository, snapshot_path, max_workers: int = 1):
+    """ Populates the repo from a snapshot of the parsed csv file, parsing it and writing the snapshot
+    first if there is none or the csv file has changed since it was taken. """
+
+    games_file_name = str(Path(data_path) / "games.csv")
+
+    batch = catalog_snapshot.load_snapshot(snapshot_path, games_file_name)
+    if batch is None:
+        # Fingerprint the csv before parsing it, so that a file changed mid-parse is caught on the next start.
+        fingerprint = catalog_snapshot.csv_fingerprint(games_file_name)
+        reader = GameFileCSVReader(games_file_name)
+        reader.read_csv_file(max_workers)
+        batch = GameBatch(reader.dataset_of_games, sorted(reader.dataset_of_publishers, key=str),
+                          sorted(reader.dataset_of_genres, key=str))
+        catalog_snapshot.write_snapshot(snapshot_path, fingerprint, batch)
+
+    repo.add_multiple_publishers(batch.publishers)
+    repo.add_multiple_genres(batch.genres)
+    repo.add_multiple_games(batch.games)
@@ -0,0 +1,58 @@
+from sqlalchemy import bindparam, inspect, select, text
+
+from games.adapters.catalog_columns import release_ordinal
+from games.adapters.catalog_counts import rebuild_counts
+from games.adapters.catalog_search import ensure_search_index
+from games.adapters.orm import metadata, games_table, genre_counts_table, wishlist_table
+
+# Keeps the oldest row of each (user_id, game_id) pair, so that the unique index on wishlist can be created.
+REMOVE_DUPLICATE_WISHLIST_ROWS = text(
+    "DELETE FROM wishlist WHERE id NOT IN (SELECT MIN(id) FROM wishlist GROUP BY user_id, game_id)")
+
+
+def add_release_ordinals(connection):
+    """ Adds the release_ordinal column to a games table that predates it and fills it from release_date. """
+    connection.execute(text("ALTER TABLE games ADD COLUMN release_ordinal INTEGER"))
+    rows = connection.execute(select([games_table.c.game_id, games_table.c.release_date])).all()
+    if not rows:
+        return
+    connection.execute(
+        games_table.update().where(games_table.c.game_id == bindparam('id')).values(
+            release_ordinal=bindparam('ordinal')),
+        [{'id': game_id, 'ordinal': release_ordinal(release_date)} for game_id, release_date in rows])
+
+
+def upgrade_schema(engine):
+    """ Brings an existing database up to the current schema in place, keeping its data.
+
+    Missing tables are created along with their indexes, missing indexes are added to the tables that
+    already exist, the full-text search and genre count tables are filled when they are new, and columns
+    added since the database was created are filled from the existing data.
+    """
+    # Goes first, because create_all would create an empty search table and keep it from being filled.
+    ensure_search_index(engine)
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    counts_missing = genre_counts_table.name not in existing_tables
+    ordinals_missing = games_table.name in existing_tables and 'release_ordinal' not in {
+        column['name'] for column in inspector.get_columns(games_table.name)}
+    # create_all only indexes the tables it creates, so collect the indexes the existing tables lack.
+    missing_indexes = []
+    for table in metadata.sorted_tables:
+        if table.name in existing_tables:
+            index_names = {index['name'] for index in inspector.get_indexes(table.name)}
+            missing_indexes.extend(index for index in table.indexes if index.name not in index_names)
+    # Duplicates can only predate the unique index, so an upgraded wishlist table is not scanned again.
+    wishlist_unique = any(index.table is wishlist_table and index.unique for index in missing_indexes)
+    metadata.create_all(engine)
+    if not (counts_missing or ordinals_missing or missing_indexes):
+        return
+    with engine.begin() as connection:
+        if counts_missing:
+            rebuild_counts(connection)
+        if ordinals_missing:
+            add_release_ordinals(connection)
+        if wishlist_unique:
+            connection.execute(REMOVE_DUPLICATE_WISHLIST_ROWS)
+        for index in missing_indexes:
+            index.create(connection)
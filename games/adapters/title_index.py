@@ -0,0 +1,71 @@
+from collections import Counter
+from itertools import chain
+from typing import Set
+
+# Titles are padded on both sides, so that their first and last characters also start and end trigrams.
+PADDING = "\x00\x00"
+
+
+def normalize_title(title: str) -> str:
+    return (title or "").lower()
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleTrigramIndex:
+    """ An inverted index from the character trigrams of normalized game titles to game ids.
+
+    The index only proposes candidates. Every candidate still has to be checked against its title, but the
+    check runs on the few games that share enough trigrams with the query instead of on the whole catalog.
+    """
+
+    def __init__(self):
+        self.__titles = dict()
+        self.__ids_by_trigram = dict()
+        self.__ids_by_length = dict()
+
+    def __len__(self):
+        return len(self.__titles)
+
+    def add(self, game_id: int, title: str):
+        title = normalize_title(title)
+        self.__titles[game_id] = title
+        self.__ids_by_length.setdefault(len(title), []).append(game_id)
+        for trigram in trigrams(PADDING + title + PADDING):
+            self.__ids_by_trigram.setdefault(trigram, []).append(game_id)
+
+    def title(self, game_id: int) -> str:
+        """ Returns the normalized title indexed for game_id. """
+        return self.__titles[game_id]
+
+    def substring_candidates(self, query: str) -> Set[int]:
+        """ Returns the ids of games whose titles may contain the normalized query.
+
+        A title containing the query contains each of its trigrams. Queries too short to have one match
+        nearly every title anyway, so all games are returned for them.
+        """
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            return set(self.__titles)
+        postings = sorted((self.__ids_by_trigram.get(trigram, []) for trigram in query_trigrams), key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def fuzzy_candidates(self, query: str, max_distance: int) -> Set[int]:
+        """ Returns the ids of games whose titles may be within max_distance edits of the normalized query.
+
+        One edit changes at most three of the padded trigrams, so such a title shares all but
+        3 * max_distance of the query's distinct trigrams (the count filter) and is at most max_distance
+        characters longer or shorter. When the count filter admits everything, only the length is used.
+        """
+        lengths = range(max(0, len(query) - max_distance), len(query) + max_distance + 1)
+        query_trigrams = trigrams(PADDING + query + PADDING)
+        minimum_shared = len(query_trigrams) - 3 * max_distance
+        if minimum_shared <= 0:
+            return set(chain.from_iterable(self.__ids_by_length.get(length, []) for length in lengths))
+
+        shared = Counter(chain.from_iterable(self.__ids_by_trigram.get(trigram, []) for trigram in query_trigrams))
+        titles = self.__titles
+        return {game_id for game_id, count in shared.items()
+                if count >= minimum_shared and len(titles[game_id]) in lengths}
@@ -1,18 +1,66 @@
+from datetime import date
+from math import isfinite
+
 from games.adapters.repository import AbstractRepository
 from games.domainmodel.model import Game
 
+GAMES_PER_PAGE = 21
+
+# sort argument of a listing -> (repository sort key, descending).
+LISTING_SORTS = {
+    'title': ('title', False),
+    'price': ('price', False),
+    'newest': ('release', True),
+}
+PRICE_ARGS = ('min_price', 'max_price')
+DATE_ARGS = ('released_from', 'released_to')
+
+
 def get_number_of_games(repo: AbstractRepository):
     return repo.get_number_of_games()
 
+
+def games_to_dicts(games):
+    return [{'game_id': game.game_id, 'title': game.title, 'release_date': game.release_date,
+             'image_url': game.image_url, 'price': game.price} for game in games]
+
+
 def get_games(repo: AbstractRepository, page):
-    games = repo.get_games()
-    game_dicts = []
-    amount_per_page = 21
-
-    for game in games:
-        game_dict = {'game_id': game.game_id, 'title': game.title, 'release_date': game.release_date, 'image_url': game.image_url, 'price': game.price}
-        game_dicts.append(game_dict)
-    if amount_per_page*page > len(game_dicts):
-        return game_dicts[amount_per_page*(page-1): amount_per_page*page - (amount_per_page*page - len(game_dicts))]
-    else:
-        return game_dicts[amount_per_page*(page-1): amount_per_page*page]
\ No newline at end of file
+    # Only the games shown on the page are loaded.
+    games = repo.get_games_page(GAMES_PER_PAGE, offset=GAMES_PER_PAGE * (page - 1))
+    return games_to_dicts(games)
+
+
+def get_listing_args(args) -> dict:
+    """ Returns the valid sort and filter arguments of a listing request, as given, leaving out the rest.
+
+    The arguments are kept as strings so that the pagination links can pass them on unchanged.
+    Prices are non-negative numbers and dates are YYYY-MM-DD.
+    """
+    listing_args = {}
+    if args.get('sort') in LISTING_SORTS:
+        listing_args['sort'] = args['sort']
+    for name in PRICE_ARGS:
+        try:
+            price = float(args.get(name, ''))
+        except ValueError:
+            continue
+        if isfinite(price) and price >= 0:
+            listing_args[name] = args[name]
+    for name in DATE_ARGS:
+        try:
+            date.fromisoformat(args.get(name, ''))
+        except ValueError:
+            continue
+        listing_args[name] = args[name]
+    return listing_args
+
+
+def find_games(repo: AbstractRepository, page, listing_args: dict, genre: str = None, default_sort: str = 'id'):
+    """ Returns the number of games matching the listing arguments and the games on the page, as dicts. """
+    sort_by, descending = LISTING_SORTS.get(listing_args.get('sort'), (default_sort, False))
+    filters = {name: float(listing_args[name]) for name in PRICE_ARGS if name in listing_args}
+    filters.update({name: date.fromisoformat(listing_args[name]) for name in DATE_ARGS if name in listing_args})
+    count, games = repo.find_games(sort_by, descending, offset=GAMES_PER_PAGE * (page - 1), limit=GAMES_PER_PAGE,
+                                   genre=genre, **filters)
+    return count, games_to_dicts(games)
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+import games.adapters.repository as repo
+
+
+class LRUCache:
+    """ A thread-safe cache of at most max_entries values that evicts the least recently used one first.
+
+    All entries belong to a single catalog version. A lookup under another version drops every entry first,
+    so nothing rendered from an older catalog is ever returned. A max_entries of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int):
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__version = None
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, version, key):
+        with self.__lock:
+            if version != self.__version:
+                self.__entries.clear()
+                self.__version = version
+            value = self.__entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, version, key, value):
+        with self.__lock:
+            # A value rendered before a newer version was seen is already out of date.
+            if version != self.__version or self.__max_entries <= 0:
+                return
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        return {'entries': len(self.__entries), 'max_entries': self.__max_entries, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hit_rate}
+
+
+def init_app(app):
+    """ Sets up the rendered page cache and the game card fragment cache of the app. """
+    app.extensions['page_cache'] = LRUCache(app.config['PAGE_CACHE_SIZE'])
+    app.extensions['fragment_cache'] = LRUCache(app.config['FRAGMENT_CACHE_SIZE'])
+    app.jinja_env.globals['game_card'] = game_card
+
+
+def game_card(game) -> Markup:
+    """ Renders the card of a game in a listing, reusing the markup rendered for it under the same catalog version.
+
+    The card template is rendered without the context processors, which only the surrounding page needs.
+    Outside of catalog pages the version is unknown, so the card is rendered every time.
+    """
+    template = current_app.jinja_env.get_template('gameCard.html')
+    version = g.get('catalog_version')
+    if version is None:
+        return Markup(template.render(game=game))
+    cache = current_app.extensions['fragment_cache']
+    # Listings pass Games or dicts, which Jinja reads alike.
+    game_id = current_app.jinja_env.getattr(game, 'game_id')
+    card = cache.get(version, game_id)
+    if card is None:
+        card = Markup(template.render(game=game))
+        cache.put(version, game_id, card)
+    return card
+
+
+def templates_fingerprint() -> str:
+    """ Returns a hash of the app's templates, computed once per app, so that a deployment with changed
+    templates does not validate pages rendered by the previous one. """
+    fingerprint = current_app.extensions.get('templates_fingerprint')
+    if fingerprint is None:
+        sha1 = hashlib.sha1()
+        template_folder = os.path.join(current_app.root_path, current_app.template_folder)
+        for directory, subdirectories, file_names in sorted(os.walk(template_folder)):
+            subdirectories.sort()
+            for file_name in sorted(file_names):
+                sha1.update(file_name.encode())
+                with open(os.path.join(directory, file_name), 'rb') as file:
+                    sha1.update(file.read())
+        fingerprint = current_app.extensions['templates_fingerprint'] = sha1.hexdigest()
+    return fingerprint
+
+
+def csrf_period() -> int:
+    # CSRF tokens expire, so a page holding one must not be validated for longer than a token lasts.
+    if not current_app.config.get('WTF_CSRF_ENABLED', True):
+        return 0
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    return int(time.time() // time_limit) if time_limit else 0
+
+
+def csrf_secret() -> str:
+    # The raw CSRF token of the session, which the token of every form rendered for it is signed from. It is
+    # created here if the session has none yet, so that the page rendered next carries the same one.
+    if not current_app.config.get('WTF_CSRF_ENABLED', True):
+        return ""
+    generate_csrf()
+    return session[current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')]
+
+
+def catalog_page(has_form: bool = False):
+    """ Makes a view rendered from the catalog answer conditional GETs without rendering it again.
+
+    The ETag is derived from the catalog version and token, the templates, the URL and the logged in user, and
+    Last-Modified is the time of the last catalog write. Pages for anonymous visitors are public, so browsers
+    and shared caches can keep them for CATALOG_CACHE_MAX_AGE seconds and then revalidate them. Pages for a
+    logged in user, and pages with a CSRF protected form (has_form), are private and revalidated every time.
+    The ETag of a page with a form also covers the session's CSRF secret, so that a new session, e.g. after
+    logging out or in, is never told to keep a form it cannot submit.
+
+    Public pages are also kept in the app's page cache under their URL and the catalog version, so that a page
+    is rendered once per catalog version rather than once per visitor. X-Page-Cache tells whether it was.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped_view(**kwargs):
+            count, modified_at = repo.repo_instance.get_catalog_version()
+            token = repo.repo_instance.catalog_token
+            version = (token, count)
+            g.catalog_version = version
+            user_name = session.get('user_name')
+            private = has_form or user_name is not None
+
+            parts = [token, str(count), templates_fingerprint(), request.full_path, user_name or ""]
+            if has_form:
+                parts.extend([str(csrf_period()), csrf_secret()])
+                # If-Modified-Since alone cannot tell when the form's token expires.
+                modified_at = None
+            etag = hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+            page_cache = current_app.extensions['page_cache']
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modified_at):
+                response = current_app.response_class(status=304)
+            elif not private and (page := page_cache.get(version, request.full_path)) is not None:
+                response = current_app.response_class(page)
+                response.headers['X-Page-Cache'] = 'HIT'
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+                if not private:
+                    page_cache.put(version, request.full_path, response.get_data())
+                    response.headers['X-Page-Cache'] = 'MISS'
+
+            response.set_etag(etag, weak=True)
+            if modified_at is not None:
+                response.last_modified = modified_at
+            if private:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.public = True
+                response.cache_control.max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', 0)
+            return response
+        return wrapped_view
+    return decorator
@@ -1,6 +1,15 @@
 from datetime import datetime
+from types import MemberDescriptorType
+from weakref import WeakValueDictionary
+
+# Every domain class declares __slots__, so that objects built for memory mode carry no per-instance dict.
+# SQLAlchemy keeps mapped attributes and its own state in the instance dict, which is why it stays available
+# (and is only allocated once something is stored in it) along with weak reference support.
+MAPPABLE_SLOTS = ('__dict__', '__weakref__')
 
 class Publisher:
+    __slots__ = ('__publisher_name',) + MAPPABLE_SLOTS
+
     def __init__(self, publisher_name: str):
         if publisher_name == "" or type(publisher_name) is not str:
             self.__publisher_name = None
@@ -36,6 +45,8 @@ class Publisher:
 
 
 class Genre:
+    __slots__ = ('__genre_name',) + MAPPABLE_SLOTS
+
     def __init__(self, genre_name: str):
         if genre_name == "" or type(genre_name) is not str:
             self.__genre_name = None
@@ -63,7 +74,36 @@ class Genre:
         return hash(self.__genre_name)
 
 
+# Only a few dozen genres and comparatively few publishers exist, so the csv reader shares one instance of
+# each through these registries. Entries disappear once nothing refers to them anymore.
+_interned_genres = WeakValueDictionary()
+_interned_publishers = WeakValueDictionary()
+
+
+def intern_genre(genre_name: str) -> Genre:
+    """ Returns the shared Genre named genre_name, creating it on first use. """
+    genre = Genre(genre_name)
+    return _interned_genres.setdefault(genre.genre_name, genre)
+
+
+def intern_publisher(publisher_name: str) -> Publisher:
+    """ Returns the shared Publisher named publisher_name, creating it on first use.
+
+    The instance is shared by every game of that publisher, so it must not be renamed.
+    """
+    publisher = Publisher(publisher_name)
+    return _interned_publishers.setdefault(publisher.publisher_name, publisher)
+
+
+def clear_interned():
+    """ Forgets the shared genres and publishers, so that the next ones are created afresh. """
+    _interned_genres.clear()
+    _interned_publishers.clear()
+
+
 class User:
+    __slots__ = ('__username', '__password', '__reviews', '__favourite_games') + MAPPABLE_SLOTS
+
     def __init__(self, username: str, password: str):
         if not isinstance(username, str) or username.strip() == "":
             raise ValueError('Username cannot be empty or non-string!')
@@ -132,6 +172,9 @@ class User:
 
 
 class Game:
+    __slots__ = ('__game_id', '__game_title', '__price', '__release_date', '__release_ordinal', '__description',
+                 '__image_url', '__website_url', '__genres', '__reviews', '__publisher') + MAPPABLE_SLOTS
+
     def __init__(self, game_id: int, game_title: str):
         if type(game_id) is not int or game_id < 0:
             raise ValueError("Game ID should be a positive integer!")
@@ -144,6 +187,7 @@ class Game:
 
         self.__price = None
         self.__release_date = None
+        self.__release_ordinal = None
         self.__description = None
         self.__image_url = None
         self.__website_url = None
@@ -197,13 +241,19 @@ class Game:
         if isinstance(release_date, str):
             try:
                 # Check if the release_date string is in the correct date format (e.g., "Oct 21, 2008")
-                datetime.strptime(release_date, "%b %d, %Y")
+                parsed_date = datetime.strptime(release_date, "%b %d, %Y")
                 self.__release_date = release_date
+                self.__release_ordinal = parsed_date.toordinal()
             except ValueError:
                 raise ValueError("Release date must be in 'Oct 21, 2008' format!")
         else:
             raise ValueError("Release date must be a string in 'Oct 21, 2008' format!")
 
+    @property
+    def release_ordinal(self):
+        """ The release date as a proleptic Gregorian ordinal, for sorting and range filters, or None. """
+        return self.__release_ordinal
+
     @property
     def description(self):
         return self.__description
@@ -280,6 +330,8 @@ class Game:
 
 
 class Review:
+    __slots__ = ('__user', '__game', '__rating', '__comment') + MAPPABLE_SLOTS
+
     def __init__(self, user: User, game: Game, rating: int, comment: str):
 
         if not isinstance(user, User):
@@ -339,6 +391,8 @@ class Review:
 
 
 class Wishlist:
+    __slots__ = ('__user', '__list_of_games', '__current') + MAPPABLE_SLOTS
+
     def __init__(self, user: User):
         if not isinstance(user, User):
             raise ValueError("User must be an instance of User class")
@@ -400,5 +454,21 @@ def make_genre_association(article: Game, genre: Genre):
     game.add_genre(genre)
     genre.add_game(game)
 
+# The slot descriptors of each domain class. Mapping a class replaces them with instrumented attributes and
+# clearing the mappers deletes those, after which instances would silently keep their fields in __dict__.
+_slot_descriptors = {
+    cls: {name: value for name, value in vars(cls).items() if isinstance(value, MemberDescriptorType)}
+    for cls in (Publisher, Genre, User, Game, Review, Wishlist)
+}
+
+
+def restore_slots():
+    """ Puts back the slot descriptors that clearing the mappers removed, leaving mapped attributes alone. """
+    for cls, descriptors in _slot_descriptors.items():
+        for name, descriptor in descriptors.items():
+            if name not in vars(cls):
+                setattr(cls, name, descriptor)
+
+
 class ModelException(Exception):
     pass
\ No newline at end of file
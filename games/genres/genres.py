@@ -1,17 +1,25 @@
-from flask import Flask, render_template, Blueprint
+from flask import Flask, render_template, Blueprint, request
 from games.genres import services
+from games.browse import services as browse_services
 from games.adapters.repository import AbstractRepository
 import games.adapters.repository as repo
+from games.caching import catalog_page
 
 genres_blueprint = Blueprint('genres_bp', __name__)
 
 
 @genres_blueprint.route('/genres/<genre>/<int:page>', methods=['GET'])
+@catalog_page()
 def browse_genre(genre, page):
     if page <= 1:
         page = 1
-    num_games = services.get_number_of_games_of_type(repo.repo_instance, genre)
-    all_games = services.get_games_of_type(repo.repo_instance, genre, page)
-    sorted_games = sorted(all_games, key=lambda game: game.title)
-    return render_template('gameLibrary.html', title=genre, games=sorted_games, num_games=num_games, index=page,
-                           pagePath='genres_bp.browse_genre', genre=genre)
+    listing_args = browse_services.get_listing_args(request.args)
+    if listing_args:
+        num_games, all_games = browse_services.find_games(repo.repo_instance, page, listing_args, genre=genre,
+                                                          default_sort='title')
+    else:
+        num_games = services.get_number_of_games_of_type(repo.repo_instance, genre)
+        # Sorted by title across all pages, not just within the page.
+        all_games = services.get_games_of_type(repo.repo_instance, genre, page)
+    return render_template('gameLibrary.html', title=genre, games=all_games, num_games=num_games, index=page,
+                           pagePath='genres_bp.browse_genre', genre=genre, listing_args=listing_args)
@@ -8,18 +8,6 @@ def get_number_of_games_of_type(repo: AbstractRepository, genre: str):
     return games_length
 
 
-def get_games_of_type(repo: AbstractRepository, genre: str, page):
-    games = repo.get_games()
-    games_list = []
-    genre_to_find = Genre(genre)
+def get_games_of_type(repo: AbstractRepository, genre: str, page, sort_by: str = 'title'):
     amount_per_page = 21
-    for game in games:
-        list_of_genres = game.genres
-        for genre_in_list in list_of_genres:
-            if genre_to_find == genre_in_list:
-                games_list.append(game)
-    if amount_per_page * page > len(games_list):
-        return games_list[
-               amount_per_page * (page - 1): amount_per_page * page - (amount_per_page * page - len(games_list))]
-    else:
-        return games_list[amount_per_page * (page - 1): amount_per_page * page]
+    return repo.get_games_of_type(genre, offset=amount_per_page * (page - 1), limit=amount_per_page, sort_by=sort_by)
@@ -15,6 +15,7 @@ from dotenv import load_dotenv
 import os
 
 from games.authentication.authentication import login_required
+from games.caching import catalog_page
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -26,8 +27,9 @@ reviews_blueprint = Blueprint(
     'reviews_bp', __name__)
 
 @reviews_blueprint.route('/game/<int:game_id>')
+@catalog_page(has_form=True)
 def gameDescription(game_id):
-    game = repo.repo_instance.get_game_by_id(game_id)
+    game = repo.repo_instance.get_game_details(game_id)
     form=CommentForm(request.values, game_id = game_id)
 
     return render_template('gameDescription.html', form=form, game=game, add_comment_url = '/comment', handler_url=url_for('reviews_bp.comment_on_game'))
@@ -28,7 +28,8 @@ def add_review(game_id: int, comment_text: str, user_name: str, rating: int, rep
     repo.add_review(review)
 
 def get_game(game_id: int, repo: AbstractRepository):
-    game = repo.get_game_by_id(game_id)
+    # The comment page lists the game's reviews and their authors.
+    game = repo.get_game_details(game_id)
     if game is None:
         raise NonExistentGameException
     
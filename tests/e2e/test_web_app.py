@@ -1,7 +1,16 @@
+import re
+
 import pytest
 
 from flask import session
 
+from games import create_app
+import games.adapters.repository as repo
+import games.authentication.services as auth_services
+from games.domainmodel.model import Game, Genre, User, make_comment
+
+from utils import get_project_root
+
 
 def test_register(client):
     # Check that we retrieve the register page.
@@ -29,3 +38,201 @@ def test_index(client):
     response = client.get('/')
     assert response.status_code == 200
     assert b'Welcome to our assignment website!' in response.data
+
+def test_side_navbar_lists_genres_with_live_counts(client):
+    # The genre links come from the repository rather than being hardcoded.
+    for game_id, genre_names in [(1, ["Indie"]), (2, ["Indie", "RPG"])]:
+        game = Game(game_id, f"Game {game_id}")
+        for genre_name in genre_names:
+            game.add_genre(Genre(genre_name))
+        repo.repo_instance.add_game(game)
+
+    response = client.get('/library/1')
+    assert response.status_code == 200
+    assert b'href="/genres/Indie/1">Indie (2)</a>' in response.data
+    assert b'href="/genres/RPG/1">RPG (1)</a>' in response.data
+
+
+def test_library_sorts_and_filters_across_pages(client):
+    for game_id, title, price, release_date in [(1, "Zeta", 4.99, "Jan 5, 2020"), (2, "Alpha", 19.99, "Mar 1, 2021"),
+                                                (3, "Mid", 0.0, "Jul 9, 2019")]:
+        game = Game(game_id, title)
+        game.price = price
+        game.release_date = release_date
+        game.add_genre(Genre("Indie"))
+        repo.repo_instance.add_game(game)
+
+    response = client.get('/library/1?sort=newest&min_price=1')
+    assert b'Total Games - 2' in response.data
+    assert response.data.index(b'Alpha') < response.data.index(b'Zeta')
+    assert b'Mid' not in response.data
+    # The pagination forms carry the listing arguments on to the next page.
+    assert b'<input type="hidden" name="sort" value="newest">' in response.data
+
+    response = client.get('/genres/Indie/1?released_from=2019-01-01&released_to=2020-12-31&max_price=oops')
+    assert b'Total Games - 2' in response.data
+    assert response.data.index(b'Mid') < response.data.index(b'Zeta')
+    assert b'name="max_price"' in response.data and b'value="oops"' not in response.data
+
+
+def test_catalog_pages_answer_conditional_gets(client):
+    game = Game(1, "Cached Game")
+    game.add_genre(Genre("Indie"))
+    repo.repo_instance.add_game(game)
+
+    response = client.get('/library/1')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert response.headers['Cache-Control'] == 'public, max-age=0'
+    assert 'Last-Modified' in response.headers
+
+    response = client.get('/library/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # Any write to the catalog changes the version, and with it the ETag.
+    repo.repo_instance.add_game(Game(2, "Another Game"))
+    response = client.get('/library/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    # Pages of a logged in user are private to that user.
+    with client.session_transaction() as session_data:
+        session_data['user_name'] = 'thorke'
+    response = client.get('/library/1')
+    assert response.headers['ETag'] != etag
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    # The game page holds a form, so it is never shared.
+    response = client.get('/game/1')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert client.get('/game/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    response = client.get('/search?query=cached')
+    assert b'Cached Game' in response.data
+    assert client.get('/search?query=cached', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_public_pages_and_game_cards_are_rendered_once_per_catalog_version(client):
+    for game_id, title in [(1, "First Game"), (2, "Second Game")]:
+        game = Game(game_id, title)
+        game.add_genre(Genre("Indie"))
+        repo.repo_instance.add_game(game)
+    page_cache = client.application.extensions['page_cache']
+    fragment_cache = client.application.extensions['fragment_cache']
+
+    assert client.get('/library/1').headers['X-Page-Cache'] == 'MISS'
+    assert client.get('/library/1').headers['X-Page-Cache'] == 'HIT'
+    assert page_cache.hits == 1
+    # The genre page is a page of its own, but its game cards were already rendered for the library.
+    fragment_hits = fragment_cache.hits
+    response = client.get('/genres/Indie/1')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert fragment_cache.hits == fragment_hits + 2
+
+    # A review changes the catalog version, so nothing cached before it is served.
+    user = User("thorke", "Password1!")
+    repo.repo_instance.add_user(user)
+    game = repo.repo_instance.get_game_by_id(1)
+    repo.repo_instance.add_review(make_comment("Great", user, 5, game, 'memory'))
+    assert client.get('/library/1').headers['X-Page-Cache'] == 'MISS'
+
+    # A changed game shows up straight away.
+    repo.repo_instance.add_game(Game(3, "Third Game"))
+    response = client.get('/library/1')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'Third Game' in response.data
+
+    # Pages of logged in users are never shared.
+    with client.session_transaction() as session_data:
+        session_data['user_name'] = 'thorke'
+    assert 'X-Page-Cache' not in client.get('/library/1').headers
+
+
+def test_wishlist_changes_for_a_missing_game_are_not_found(client):
+    repo.repo_instance.add_user(User("thorke", "Password1!"))
+    with client.session_transaction() as session_data:
+        session_data['user_name'] = 'thorke'
+
+    assert client.post('/add_to_wishlist/12345678').status_code == 404
+    assert client.post('/remove_from_wishlist/12345678').status_code == 404
+    assert repo.repo_instance.get_wishlist_games(repo.repo_instance.get_user('thorke')) == []
+
+
+def test_apps_with_their_own_memory_repository_do_not_share_etags(client):
+    repo.repo_instance.add_game(Game(1, "First App Game"))
+    etag = client.get('/library/1').headers['ETag']
+
+    # A second process starts its own repository, whose version counts its writes from 0 again.
+    other_client = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': get_project_root() / "tests" / "data",
+        'WTF_CSRF_ENABLED': False
+    }).test_client()
+    repo.repo_instance.add_game(Game(1, "Second App Game"))
+    response = other_client.get('/library/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b'Second App Game' in response.data
+
+
+def test_profile_pages_through_all_reviews_of_a_user(client):
+    user = User("thorke", "Password1!")
+    repo.repo_instance.add_user(user)
+    for number in range(25):
+        game = Game(number + 1, f"Game number {number}")
+        repo.repo_instance.add_game(game)
+        repo.repo_instance.add_review(make_comment(f"Review number {number}", user, 4, game, 'memory'))
+    with client.session_transaction() as session_data:
+        session_data['user_name'] = 'thorke'
+
+    response = client.get('/profile/thorke')
+    assert b'Review number 24' in response.data and b'Review number 5' in response.data
+    assert b'Review number 4<' not in response.data
+    assert b'Next' in response.data and b'Previous' not in response.data
+
+    response = client.get('/profile/thorke?page=2')
+    assert b'Review number 4<' in response.data and b'Review number 0<' in response.data
+    assert b'Review number 5<' not in response.data
+    assert b'Previous' in response.data and b'Next' not in response.data
+
+
+def csrf_token(page: bytes) -> str:
+    return re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1).decode()
+
+
+def test_form_pages_are_not_revalidated_for_a_new_session():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': get_project_root() / "tests" / "data",
+        'WTF_CSRF_ENABLED': True
+    })
+    client = app.test_client()
+    repo.repo_instance.add_game(Game(1, "Form Game"))
+    auth_services.add_user('thorke', 'Password1!', repo.repo_instance)
+
+    response = client.get('/game/1')
+    etag, token = response.headers['ETag'], csrf_token(response.data)
+    assert client.get('/game/1', headers={'If-None-Match': etag}).status_code == 304
+
+    # Another browser has a session of its own.
+    response = app.test_client().get('/game/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    # Logging out clears the session, and with it the secret the form's token was signed from.
+    client.get('/authentication/logout')
+    response = client.get('/game/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert csrf_token(response.data) != token
+    etag = response.headers['ETag']
+
+    # So does logging in.
+    login_token = csrf_token(client.get('/authentication/login').data)
+    response = client.post('/authentication/login',
+                           data={'user_name': 'thorke', 'password': 'Password1!', 'csrf_token': login_token})
+    assert response.status_code == 302
+    response = client.get('/game/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert client.get('/game/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
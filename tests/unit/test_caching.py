@@ -0,0 +1,54 @@
+import games.adapters.repository as repo
+from games.caching import LRUCache
+from games.domainmodel.model import Game
+
+
+def test_lru_cache_evicts_the_least_recently_used_entry():
+    cache = LRUCache(2)
+    assert cache.get(1, 'a') is None
+    cache.put(1, 'a', "page a")
+    cache.put(1, 'b', "page b")
+    assert cache.get(1, 'a') == "page a"
+    # 'b' is now the least recently used entry.
+    cache.put(1, 'c', "page c")
+    assert cache.get(1, 'b') is None
+    assert cache.get(1, 'a') == "page a" and cache.get(1, 'c') == "page c"
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert cache.hit_rate == 0.6
+
+
+def test_lru_cache_drops_entries_of_older_catalog_versions():
+    cache = LRUCache(10)
+    cache.get(1, 'a')
+    cache.put(1, 'a', "old page")
+    assert cache.get(2, 'a') is None
+    assert len(cache) == 0
+    # A page rendered from version 1 after version 2 was seen is not stored.
+    cache.put(1, 'a', "old page")
+    assert cache.get(2, 'a') is None
+    cache.put(2, 'a', "new page")
+    assert cache.get(2, 'a') == "new page"
+    assert cache.stats() == {'entries': 1, 'max_entries': 10, 'hits': 1, 'misses': 3, 'hit_rate': 0.25}
+
+
+def test_lru_cache_of_size_zero_stores_nothing():
+    cache = LRUCache(0)
+    cache.get(1, 'a')
+    cache.put(1, 'a', "page")
+    assert cache.get(1, 'a') is None
+
+
+def test_catalog_listings_share_their_game_cards(client):
+    for game_id, title in [(1, "Cached Card"), (2, "Another Cached Card")]:
+        repo.repo_instance.add_game(Game(game_id, title))
+    fragment_cache = client.application.extensions['fragment_cache']
+
+    client.get('/library/1')
+    assert len(fragment_cache) == 2
+    # Search results render the same cards as the library, so both come from the fragment cache.
+    hits = fragment_cache.hits
+    response = client.get('/search?query=cached card')
+    assert b'Another Cached Card' in response.data
+    assert fragment_cache.hits == hits + 2
+    assert len(fragment_cache) == 2
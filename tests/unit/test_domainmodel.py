@@ -1,7 +1,7 @@
 import pytest
 import os
-from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist
-from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist, intern_genre, intern_publisher
+from games.adapters.datareader.csvdatareader import GameFileCSVReader, find_record_boundaries
 
 
 def test_publisher_init():
@@ -464,3 +464,66 @@ def test_genres_dataset():
     sorted_genres = sorted(genres_set)
     sorted_genre_sample = str(sorted_genres[:3])
     assert sorted_genre_sample == "[<Genre Action>, <Genre Adventure>, <Genre Animation & Modeling>]"
+
+
+def test_read_csv_file_in_batches():
+    dir_name = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    games_file_name = os.path.join(dir_name, "games/adapters/data/games.csv")
+    reader = GameFileCSVReader(games_file_name)
+    batches = list(reader.read_csv_file_in_batches(100))
+
+    # 877 games are split into 8 full batches and one partial batch.
+    assert [len(batch.games) for batch in batches] == [100] * 8 + [77]
+    assert batches[0].games[0].game_id == 7940
+
+    # Every publisher and genre is yielded exactly once, with the first batch that uses it.
+    publishers = [publisher for batch in batches for publisher in batch.publishers]
+    genres = [genre for batch in batches for genre in batch.genres]
+    assert len(publishers) == len(set(publishers)) == 798
+    assert len(genres) == len(set(genres)) == 24
+    assert reader.dataset_of_games == []
+
+
+def test_read_csv_file_in_batches_rejects_invalid_batch_size():
+    reader = GameFileCSVReader("games/adapters/data/games.csv")
+    with pytest.raises(ValueError):
+        next(reader.read_csv_file_in_batches(0))
+
+
+def test_read_csv_file_in_parallel_matches_sequential_read():
+    sequential_reader = create_csv_reader()
+
+    dir_name = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    games_file_name = os.path.join(dir_name, "games/adapters/data/games.csv")
+    parallel_reader = GameFileCSVReader(games_file_name)
+    parallel_reader.read_csv_file(max_workers=2)
+
+    # Games come back in file order, and publishers and genres are shared between games.
+    assert [game.game_id for game in parallel_reader.dataset_of_games] == \
+           [game.game_id for game in sequential_reader.dataset_of_games]
+    assert parallel_reader.dataset_of_publishers == sequential_reader.dataset_of_publishers
+    assert parallel_reader.dataset_of_genres == sequential_reader.dataset_of_genres
+    action_games = [game for game in parallel_reader.dataset_of_games if Genre("Action") in game.genres]
+    assert len({id(game.genres[game.genres.index(Genre("Action"))]) for game in action_games}) == 1
+
+
+def test_find_record_boundaries_splits_on_records():
+    dir_name = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    games_file_name = os.path.join(dir_name, "games/adapters/data/games.csv")
+    fieldnames, ranges = find_record_boundaries(games_file_name, 8)
+
+    assert fieldnames[0] == "AppID"
+    assert 1 < len(ranges) <= 9
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert ranges[-1][1] == os.path.getsize(games_file_name)
+
+
+def test_interned_genres_and_publishers_are_shared():
+    assert intern_genre("Action") is intern_genre(" Action ")
+    assert intern_genre("Action") == Genre("Action")
+    assert intern_publisher("Activision") is intern_publisher("Activision")
+    assert intern_publisher("Activision") is not intern_publisher("Valve")
+
+    reader = create_csv_reader()
+    action_genres = {id(genre) for game in reader.dataset_of_games for genre in game.genres if genre == Genre("Action")}
+    assert len(action_genres) == 1
@@ -1,9 +1,14 @@
+from datetime import date, datetime
+
 import pytest
 
-from games.adapters.repository import RepositoryException
-from games.domainmodel.model import Game, User, Review
+from games.adapters.repository import RepositoryException, SEARCH_RESULT_LIMIT
+from games.domainmodel.model import Game, Genre, User, Review, make_comment
 from games.adapters import memory_repository
 from games.adapters.memory_repository import MemoryRepository
+from games.adapters.title_index import TitleTrigramIndex
+from games.adapters import catalog_snapshot, repository_populate
+from utils import get_project_root
 from tests.unit.test_domainmodel import user
 
 
@@ -53,6 +58,15 @@ def test_repository_can_search_for_game(in_memory_repo):
     assert games[0] == Game(572510, "Superola Champion Edition")
 
 
+def test_repository_searches_short_queries_as_substrings_up_to_the_limit(in_memory_repo):
+    titles = [game.title.lower() for game in in_memory_repo.get_games()]
+    games = in_memory_repo.search_games("ut", limit=1000)
+    assert sorted(game.title.lower() for game in games if "ut" in game.title.lower()) == \
+           sorted(title for title in titles if "ut" in title)
+    assert len(in_memory_repo.search_games("e")) == SEARCH_RESULT_LIMIT
+    assert len(in_memory_repo.search_games("e", limit=5)) == 5
+
+
 def test_repository_gets_correct_amount_of_genre_games(in_memory_repo):
     indie_games = in_memory_repo.get_number_of_games_of_type("Indie")
     action_games = in_memory_repo.get_number_of_games_of_type("Action")
@@ -198,3 +212,278 @@ def test_repository_can_remove_wishlist_games(in_memory_repo):
     in_memory_repo.remove_wishlist_game(a_game, a_user)
 
     assert in_memory_repo.get_number_of_wishlist_games(a_user) == 0
+
+
+def test_repository_can_be_populated_from_a_snapshot(tmp_path):
+    data_path = get_project_root() / "games" / "adapters" / "data"
+    snapshot_path = tmp_path / "games.snapshot"
+
+    # The first start parses the csv file and writes the snapshot.
+    first_repo = MemoryRepository()
+    repository_populate.populate_from_snapshot(data_path, first_repo, snapshot_path)
+    assert snapshot_path.exists()
+
+    # Later starts load the same catalog from the snapshot.
+    second_repo = MemoryRepository()
+    repository_populate.populate_from_snapshot(data_path, second_repo, snapshot_path)
+    assert second_repo.get_number_of_games() == first_repo.get_number_of_games() == 877
+    assert second_repo.get_game_by_id(7940).title == "Call of Duty® 4: Modern Warfare®"
+
+
+def test_stale_snapshot_is_not_loaded(tmp_path):
+    csv_path = tmp_path / "games.csv"
+    csv_path.write_bytes((get_project_root() / "tests" / "data" / "test_games.csv").read_bytes())
+    snapshot_path = tmp_path / "games.snapshot"
+    repository_populate.populate_from_snapshot(tmp_path, MemoryRepository(), snapshot_path)
+    assert catalog_snapshot.load_snapshot(snapshot_path, csv_path) is not None
+
+    with open(csv_path, "a", encoding="utf-8") as file:
+        file.write("\n")
+    assert catalog_snapshot.load_snapshot(snapshot_path, csv_path) is None
+
+
+def test_repository_lookups_follow_added_games_and_users(in_memory_repo):
+    games = [Game(game_id, f"bulk game {game_id}") for game_id in (90000003, 90000001, 90000002)]
+    in_memory_repo.add_multiple_games(games)
+    assert all(in_memory_repo.get_game_by_id(game.game_id) is game for game in games)
+    assert in_memory_repo.get_game_by_id(90000004) is None
+
+    # A second user registering under a taken name does not replace the first.
+    first_user = User("dave", "password1")
+    in_memory_repo.add_user(first_user)
+    in_memory_repo.add_user(User("dave", "password2"))
+    assert in_memory_repo.get_user("dave") is first_user
+
+
+def test_repository_gets_games_of_type(in_memory_repo):
+    indie_games = in_memory_repo.get_games_of_type("Indie")
+    assert len(indie_games) == 64
+    assert all(Genre("Indie") in game.genres for game in indie_games)
+    assert indie_games == sorted(indie_games)
+
+    # Pages are slices of the same ordering.
+    assert in_memory_repo.get_games_of_type("Indie", offset=21, limit=21) == indie_games[21:42]
+    assert in_memory_repo.get_games_of_type("No Such Genre") == []
+
+
+def test_repository_indexes_genres_of_added_games(in_memory_repo):
+    game = Game(1, "First Indie Game")
+    game.add_genre(Genre("Indie"))
+    in_memory_repo.add_game(game)
+
+    assert in_memory_repo.get_number_of_games_of_type("Indie") == 65
+    assert in_memory_repo.get_games_of_type("Indie", limit=1) == [game]
+
+
+def test_repository_gets_reviews_of_a_user_newest_first(in_memory_repo):
+    a_user = User("vitali", "aPassword1")
+    another_user = User("george", "aPassword1")
+    in_memory_repo.add_user(a_user)
+    in_memory_repo.add_user(another_user)
+    a_game = in_memory_repo.get_game_by_id(311120)
+
+    reviews = []
+    for number, user in enumerate([a_user, another_user, a_user, a_user]):
+        review = make_comment(f"Comment number {number}", user, 3, a_game, 'memory')
+        in_memory_repo.add_review(review)
+        if user is a_user:
+            reviews.append(review)
+
+    assert in_memory_repo.get_reviews(a_user) == reviews[::-1]
+    assert in_memory_repo.get_reviews(a_user, limit=2) == [reviews[2], reviews[1]]
+    assert in_memory_repo.get_reviews(a_user, offset=2, limit=2) == [reviews[0]]
+    assert in_memory_repo.get_reviews(a_user, offset=5) == []
+    assert in_memory_repo.get_reviews(None) == []
+
+
+def test_repository_bulk_adds_games_in_order(in_memory_repo):
+    games = [Game(game_id, f"bulk game {game_id}") for game_id in (99999999, 1, 400000)]
+    for game in games:
+        game.add_genre(Genre("Indie"))
+    in_memory_repo.add_multiple_games(games)
+
+    all_games = in_memory_repo.get_games()
+    assert all_games == sorted(all_games)
+    assert len(all_games) == 102
+    assert all_games[0] is games[1] and all_games[-1] is games[0]
+
+    indie_games = in_memory_repo.get_games_of_type("Indie")
+    assert len(indie_games) == 67
+    assert indie_games == sorted(indie_games)
+    assert in_memory_repo.get_game_by_id(400000) is games[2]
+
+
+def test_repository_keeps_the_first_game_added_under_an_id(in_memory_repo):
+    stored_game = in_memory_repo.get_game_by_id(7940)
+    in_memory_repo.add_game(Game(7940, "Replacement"))
+    games = [Game(7940, "Bulk replacement"), Game(5, "New game"), Game(5, "Repeated new game")]
+    for game in games:
+        game.add_genre(Genre("Indie"))
+    in_memory_repo.add_multiple_games(games)
+
+    assert in_memory_repo.get_game_by_id(7940) is stored_game
+    assert in_memory_repo.get_game_by_id(5) is games[1]
+    assert in_memory_repo.get_number_of_games() == len(in_memory_repo.get_games()) == 100
+    assert [game.game_id for game in in_memory_repo.get_games()].count(7940) == 1
+    assert in_memory_repo.get_number_of_games_of_type("Indie") == 65
+    assert in_memory_repo.find_games(genre="Indie")[0] == 65
+
+
+def test_repository_finds_games_through_the_columnar_catalog(in_memory_repo):
+    count, games = in_memory_repo.find_games(genre="Indie")
+    assert count == 64
+    assert games == in_memory_repo.get_games_of_type("Indie")
+
+    count, games = in_memory_repo.find_games(genre="Indie", max_price=5, sort_by='price', descending=True, limit=5)
+    assert count == len([game for game in in_memory_repo.get_games_of_type("Indie") if game.price <= 5])
+    assert len(games) == 5
+    assert all(game.price <= 5 for game in games)
+    assert [game.price for game in games] == sorted((game.price for game in games), reverse=True)
+
+
+def test_repository_sorts_games_by_title_from_a_cached_order(in_memory_repo):
+    def by_title(games, descending=False):
+        # Equal titles stay in ascending id order in both directions.
+        return sorted(sorted(games, key=lambda game: game.game_id), key=lambda game: game.title, reverse=descending)
+
+    count, games = in_memory_repo.find_games(sort_by='title')
+    assert count == 99 and games == by_title(in_memory_repo.get_games())
+    count, games = in_memory_repo.find_games(sort_by='title', descending=True, genre="Indie", offset=5, limit=10)
+    assert count == 64 and games == by_title(in_memory_repo.get_games_of_type("Indie"), descending=True)[5:15]
+
+    # Games added later show up in the next title sort.
+    in_memory_repo.add_game(Game(1, "Aaa First"))
+    in_memory_repo.add_multiple_games([Game(2, "Aaa First"), Game(3, "Zzz Last")])
+    count, games = in_memory_repo.find_games(sort_by='title')
+    assert count == 102 and games == by_title(in_memory_repo.get_games())
+    count, games = in_memory_repo.find_games(sort_by='title', descending=True)
+    assert games == by_title(in_memory_repo.get_games(), descending=True)
+
+
+def test_repository_filters_on_any_number_of_genres():
+    repository = MemoryRepository()
+    for game_id in range(1, 101):
+        game = Game(game_id, f"Game {game_id}")
+        game.add_genre(Genre(f"Genre {game_id}"))
+        game.add_genre(Genre("Shared"))
+        repository.add_game(game)
+    repository.add_multiple_games([Game(1000 + game_id, "Bulk Game") for game_id in range(3)])
+
+    assert repository.get_number_of_games() == 103
+    assert repository.find_games(genre="Genre 100") == (1, [repository.get_game_by_id(100)])
+    count, games = repository.find_games(genre="Shared", sort_by='id', descending=True, limit=2)
+    assert count == 100 and [game.game_id for game in games] == [100, 99]
+
+
+def test_repository_finds_games_by_release_date(in_memory_repo):
+    released_from, released_to = date(2020, 1, 1), date(2020, 12, 31)
+    count, games = in_memory_repo.find_games(released_from=released_from, released_to=released_to, sort_by='release')
+
+    expected = [game for game in in_memory_repo.get_games()
+                if released_from <= datetime.strptime(game.release_date, "%b %d, %Y").date() <= released_to]
+    assert count == len(expected) > 0
+    assert set(games) == set(expected)
+    release_dates = [datetime.strptime(game.release_date, "%b %d, %Y") for game in games]
+    assert release_dates == sorted(release_dates)
+
+    with pytest.raises(ValueError):
+        in_memory_repo.find_games(sort_by='rating')
+
+
+def test_repository_finds_games_sorted_by_title(in_memory_repo):
+    by_title = sorted(in_memory_repo.get_games_of_type("Indie"), key=lambda game: (game.title, game.game_id))
+    count, games = in_memory_repo.find_games(sort_by='title', genre="Indie", offset=21, limit=21)
+    assert count == 64
+    assert games == by_title[21:42]
+
+    count, games = in_memory_repo.find_games(sort_by='title', descending=True, min_price=10)
+    assert [game.title for game in games] == sorted((game.title for game in games), reverse=True)
+    assert count == len(games) and all(game.price >= 10 for game in games)
+
+
+def test_bounded_similarity_agrees_with_the_full_edit_distance():
+    words = ["", "a", "super", "supper", "superman", "spuer", "mario kart", "mario party", "marioo", "zzzz"]
+    for first in words:
+        for second in words:
+            distance = memory_repository.calculate_similarity(first, second)
+            for max_distance in range(5):
+                expected = distance if distance <= max_distance else max_distance + 1
+                assert memory_repository.bounded_similarity(first, second, max_distance) == expected
+
+
+def test_repository_search_finds_titles_within_the_similarity_threshold(in_memory_repo):
+    game = in_memory_repo.get_games()[0]
+    # A misspelt title that is neither equal to nor a substring of the original.
+    query = game.title.lower()[1:] + "x"
+    assert game in in_memory_repo.search_games(query)
+
+
+def test_title_index_candidates_cover_every_match():
+    index = TitleTrigramIndex()
+    titles = {1: "Super Mario", 2: "Super Meat Boy", 3: "Mario Kart", 4: "Tetris", 5: "Portal"}
+    for game_id, title in titles.items():
+        index.add(game_id, title)
+
+    assert index.title(1) == "super mario"
+    assert {1, 2} <= index.substring_candidates("super")
+    assert 4 not in index.substring_candidates("super")
+    # Queries without a full trigram cannot narrow the candidates down.
+    assert index.substring_candidates("su") == set(titles)
+
+    assert 3 in index.fuzzy_candidates("mario kary", 3)
+    assert 5 not in index.fuzzy_candidates("mario kary", 3)
+    # Short queries are only filtered on length.
+    assert index.fuzzy_candidates("tetra", 3) == {4, 5}
+
+
+def test_repository_gets_games_by_ids(in_memory_repo):
+    games = in_memory_repo.get_games_by_ids([242530, 12345678, 7940])
+    assert games == [in_memory_repo.get_game_by_id(242530), in_memory_repo.get_game_by_id(7940)]
+    assert in_memory_repo.get_games_by_ids([]) == []
+
+
+def test_repository_gets_a_page_of_games(in_memory_repo):
+    games = in_memory_repo.get_games()
+    assert in_memory_repo.get_games_page(21) == games[:21]
+    assert in_memory_repo.get_games_page(21, offset=84) == games[84:]
+    # Keyset pagination continues after the last game of the previous page.
+    assert in_memory_repo.get_games_page(21, after_id=games[20].game_id) == games[21:42]
+    assert in_memory_repo.get_games_page(21, after_id=games[20].game_id - 1) == games[20:41]
+    assert in_memory_repo.get_games_page(21, after_id=games[-1].game_id) == []
+
+
+def test_repository_sorts_the_games_of_a_genre_by_title(in_memory_repo):
+    indie_games = in_memory_repo.get_games_of_type("Indie")
+    by_title = sorted(indie_games, key=lambda game: (game.title, game.game_id))
+    assert in_memory_repo.get_games_of_type("Indie", sort_by='title') == by_title
+    assert in_memory_repo.get_games_of_type("Indie", offset=21, limit=21, sort_by='title') == by_title[21:42]
+
+    # A new game of the genre shows up in title order too.
+    game = Game(1, "AAA First Game")
+    game.add_genre(Genre("Indie"))
+    in_memory_repo.add_game(game)
+    assert in_memory_repo.get_games_of_type("Indie", limit=1, sort_by='title') == [game]
+
+    with pytest.raises(ValueError):
+        in_memory_repo.get_games_of_type("Indie", sort_by='price')
+
+
+def test_repository_counts_games_per_genre(in_memory_repo):
+    counts = dict(in_memory_repo.get_genre_counts())
+    assert counts["Indie"] == 64 and counts["Action"] == 99 and counts["Adventure"] == 82
+    assert [genre_name for genre_name, count in in_memory_repo.get_genre_counts()] == sorted(counts)
+
+
+def test_repository_bumps_the_catalog_version_on_writes(in_memory_repo):
+    version, modified_at = in_memory_repo.get_catalog_version()
+    assert version > 0 and modified_at is not None
+    assert MemoryRepository().get_catalog_version() == (0, None)
+
+    in_memory_repo.add_user(User("thorke", "Password1!"))
+    assert in_memory_repo.get_catalog_version()[0] == version
+
+    game = in_memory_repo.get_game_by_id(7940)
+    in_memory_repo.add_review(make_comment("Still great", in_memory_repo.get_user("thorke"), 5, game, 'memory'))
+    assert in_memory_repo.get_catalog_version()[0] == version + 1
+    in_memory_repo.add_game(Game(1, "New Game"))
+    assert in_memory_repo.get_catalog_version()[0] == version + 2
@@ -1,10 +1,10 @@
 import pytest
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, clear_mappers
+from sqlalchemy.orm import sessionmaker
 
-from games.adapters.orm import metadata, map_model_to_tables
-from games.adapters import database_repository, repository_populate
+from games.adapters.orm import metadata, map_model_to_tables, clear_model_mappers
+from games.adapters import database_template
 from games.domainmodel.model import Game, User, Review
 from utils import get_project_root
 
@@ -14,41 +14,38 @@ TEST_DATA_PATH_DATABASE_LIMITED = get_project_root() / "tests" / "data"
 TEST_DATABASE_URI_IN_MEMORY = 'sqlite://'
 TEST_DATABASE_URI_FILE = 'sqlite:///test_repo.db'
 
+@pytest.fixture(scope='session')
+def template_directory(tmp_path_factory):
+    # Populated databases are built once per csv file for the whole test run and copied into each fixture.
+    return tmp_path_factory.mktemp("database_templates")
+
+
+def clone_populated_database(engine, template_directory, data_path):
+    clear_model_mappers()
+    map_model_to_tables()
+    template = database_template.ensure_template(template_directory, data_path)
+    database_template.clone_into_engine(template, engine)
+
+
 @pytest.fixture
-def database_engine():
-    clear_mappers()
+def database_engine(template_directory):
     engine = create_engine(TEST_DATABASE_URI_FILE)
-    metadata.create_all(engine)  # Conditionally create database tables.
-    for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
-        engine.execute(table.delete())
-    map_model_to_tables()
-    # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
-    session_factory = sessionmaker(autocommit=False, autoflush=True, bind=engine)
-    # Create the SQLAlchemy DatabaseRepository instance for a sqlite3-based repository.
-    repo_instance = database_repository.SqlAlchemyRepository(session_factory)
-    repository_populate.populate(TEST_DATA_PATH_DATABASE_LIMITED, repo_instance)
+    clone_populated_database(engine, template_directory, TEST_DATA_PATH_DATABASE_LIMITED)
     yield engine
     metadata.drop_all(engine)
 
 @pytest.fixture
-def session_factory():
-    clear_mappers()
+def session_factory(template_directory):
     engine = create_engine(TEST_DATABASE_URI_IN_MEMORY)
-    metadata.create_all(engine)
-    for table in reversed(metadata.sorted_tables):
-        engine.execute(table.delete())
-    map_model_to_tables()
+    clone_populated_database(engine, template_directory, TEST_DATA_PATH_DATABASE_FULL)
     # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
     session_factory = sessionmaker(autocommit=False, autoflush=True, bind=engine)
-    # Create the SQLAlchemy DatabaseRepository instance for a sqlite3-based repository.
-    repo_instance = database_repository.SqlAlchemyRepository(session_factory)
-    repository_populate.populate(TEST_DATA_PATH_DATABASE_FULL, repo_instance)
     yield session_factory
     metadata.drop_all(engine)
 
 @pytest.fixture
 def empty_session():
-    clear_mappers()
+    clear_model_mappers()
     engine = create_engine(TEST_DATABASE_URI_IN_MEMORY)
     metadata.create_all(engine)
     for table in reversed(metadata.sorted_tables):
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool
+
+from games.adapters.database_engine import create_database_engine, sqlite_pragmas
+
+
+def test_sqlite_pragmas_are_read_from_the_config():
+    config = {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL', 'SQLITE_CACHE_SIZE': '-16000',
+              'SQLITE_MMAP_SIZE': '', 'SQLITE_TEMP_STORE': None}
+    assert sqlite_pragmas(config) == {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': '-16000'}
+
+    with pytest.raises(ValueError):
+        sqlite_pragmas({'SQLITE_JOURNAL_MODE': 'WAL; DROP TABLE games'})
+
+
+def test_database_engine_applies_the_performance_profile(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'games.db'}", pool_class='QueuePool', pool_size=3,
+                                    pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'temp_store': 'MEMORY'})
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == 'wal'
+        # NORMAL is 1 and MEMORY is 2.
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+    engine.dispose()
+
+    assert isinstance(create_database_engine("sqlite://").pool, NullPool)
+    with pytest.raises(ValueError):
+        create_database_engine("sqlite://", pool_class='NoSuchPool')
@@ -1,12 +1,22 @@
+import shutil
 from datetime import date, datetime
 
 import pytest
-from sqlalchemy import inspect
+from sqlalchemy import create_engine, inspect, event, select
+from sqlalchemy.orm import sessionmaker
 
 import games.adapters.repository as repo
+from games import create_app
 from games.adapters.database_repository import SqlAlchemyRepository
-from games.domainmodel.model import User, make_comment
-from games.adapters.repository import RepositoryException
+from games.adapters.orm import (
+    metadata, games_table, game_genres_table, publishers_table, genres_table, genre_counts_table, search_table
+)
+from games.adapters import memory_repository
+from games.adapters.memory_repository import MemoryRepository
+from games.domainmodel.model import User, Game, Genre, make_comment
+from games.adapters import repository_populate
+from utils import get_project_root
+from games.adapters.repository import RepositoryException, SEARCH_RESULT_LIMIT
 
 
 def test_repository_can_add_a_user(session_factory):
@@ -20,3 +30,254 @@ def test_repository_can_add_a_user(session_factory):
     user2 = repository.get_user('Dave')
 
     assert user2 is user
+
+
+def make_populated_repository(empty_session, tmp_path, **repository_options):
+    shutil.copy(get_project_root() / "tests" / "data" / "test_games.csv", tmp_path / "games.csv")
+    repository = SqlAlchemyRepository(sessionmaker(bind=empty_session.bind), **repository_options)
+    repository_populate.populate(tmp_path, repository)
+    return repository
+
+
+def table_rows(engine, tables) -> dict:
+    with engine.connect() as connection:
+        return {table.name: sorted(map(tuple, connection.execute(select([table]))), key=repr) for table in tables}
+
+
+def test_repository_bulk_load_matches_merge_path(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True, batch_size=7)
+    merge_engine = create_engine('sqlite://')
+    metadata.create_all(merge_engine)
+    merge_repository = SqlAlchemyRepository(sessionmaker(bind=merge_engine))
+    repository_populate.populate(tmp_path, merge_repository)
+    merge_repository.close_session()
+
+    # Both paths store the same rows, down to the search index and the genre counts.
+    tables = (games_table, game_genres_table, publishers_table, genres_table, genre_counts_table, search_table)
+    assert table_rows(empty_session.bind, tables) == table_rows(merge_engine, tables)
+    assert len(table_rows(merge_engine, [games_table])['games']) == 99
+    merge_engine.dispose()
+
+    assert repository.get_number_of_games() == 99
+    assert repository.get_number_of_games_of_type("Indie") == 64
+    game = repository.get_game_by_id(7940)
+    assert game.publisher.publisher_name == "Activision"
+    assert [genre.genre_name for genre in game.genres] == ["Action"]
+
+    # Loading the same catalog again updates the stored rows instead of duplicating them.
+    game = Game(7940, "Call of Duty® 4")
+    game.price = 1.99
+    game.release_date = "Nov 12, 2007"
+    repository.add_multiple_games([game])
+    repository_populate.populate(tmp_path, repository)
+    assert repository.get_number_of_games() == 99
+    assert repository.get_number_of_games_of_type("Action") == 99
+    assert repository.get_game_by_id(7940).price == 9.99
+
+
+def test_repository_gets_reviews_of_a_user_newest_first(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    repository.add_user(User('thorke', 'Password1!'))
+    repository.add_user(User('fmercury', 'Password1!'))
+    game = repository.get_game_by_id(7940)
+
+    for number, user_name in enumerate(['thorke', 'fmercury', 'thorke', 'thorke']):
+        repository.add_review(make_comment(f"Comment number {number}", repository.get_user(user_name), 3, game, 'database'))
+
+    user = repository.get_user('thorke')
+    assert [review.comment for review in repository.get_reviews(user)] == \
+           ["Comment number 3", "Comment number 2", "Comment number 0"]
+    assert [review.comment for review in repository.get_reviews(user, offset=1, limit=1)] == ["Comment number 2"]
+    assert repository.get_reviews(None) == []
+
+
+@pytest.mark.parametrize("bulk_load", [False, True])
+def test_repository_searches_the_full_text_index(empty_session, tmp_path, bulk_load):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=bulk_load)
+
+    # Words may be prefixes, and matches in titles outrank matches elsewhere.
+    assert repository.search_games("call of dut")[0].game_id == 7940
+    # Publishers and genres are searchable too.
+    assert 7940 in [game.game_id for game in repository.search_games("activision")]
+    assert len(repository.search_games("action")) == 50
+    assert len(repository.search_games("action", limit=5)) == 5
+    assert repository.search_games("sadasdwqdAS") == []
+    # Text that is not made of words is never passed on as query syntax.
+    assert repository.search_games('"(*)" -') == []
+    # Queries shorter than a trigram match anywhere in the title, also within words.
+    titles = [game.title for game in repository.search_games("ut", limit=1000)]
+    assert "Call of Duty® 4: Modern Warfare®" in titles
+    assert titles and all("ut" in title.lower() for title in titles)
+    assert titles == sorted(titles)
+    assert len(repository.search_games("e")) == SEARCH_RESULT_LIMIT
+
+
+def test_repository_gets_games_by_ids_in_one_batch(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    statements = []
+    event.listen(empty_session.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    games = repository.get_games_by_ids([242530, 12345678, 7940])
+    # Missing ids are left out, and the genres and publishers come with the games.
+    assert [game.game_id for game in games] == [242530, 7940]
+    assert [game.publisher.publisher_name for game in games] == ["Rebellion", "Activision"]
+    assert [genre.genre_name for genre in games[1].genres] == ["Action"]
+    assert len(statements) == 2
+
+    assert {game.game_id for game in repository.get_games_by_ids([7940, 242530], preserve_order=False)} == {7940, 242530}
+    assert repository.get_games_by_ids([]) == []
+
+
+def test_repository_gets_wishlist_games_in_the_order_they_were_added(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    repository.add_user(User('thorke', 'Password1!'))
+    user = repository.get_user('thorke')
+    for game_id in [242530, 7940]:
+        repository.add_wishlist_game(repository.get_game_by_id(game_id), user)
+    # Adding a game a second time leaves the wishlist as it is.
+    repository.add_wishlist_game(repository.get_game_by_id(242530), user)
+    # Games that do not exist are ignored.
+    repository.add_wishlist_game(repository.get_game_by_id(12345678), user)
+    repository.remove_wishlist_game(repository.get_game_by_id(12345678), user)
+
+    assert [game.game_id for game in repository.get_wishlist_games(user)] == [242530, 7940]
+
+
+def test_repository_gets_a_page_of_games(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    game_ids = sorted(game.game_id for game in repository.get_games())
+
+    assert [game.game_id for game in repository.get_games_page(21)] == game_ids[:21]
+    assert [game.game_id for game in repository.get_games_page(21, offset=84)] == game_ids[84:]
+    assert [game.game_id for game in repository.get_games_page(21, after_id=game_ids[20])] == game_ids[21:42]
+    assert repository.get_games_page(21, after_id=game_ids[-1]) == []
+
+
+def test_repository_sorts_the_games_of_a_genre_by_title(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    indie_games = repository.get_games_of_type("Indie")
+    by_title = sorted(indie_games, key=lambda game: (game.title, game.game_id))
+
+    assert repository.get_number_of_games_of_type("Indie") == 64
+    assert repository.get_games_of_type("Indie", sort_by='title') == by_title
+    assert repository.get_games_of_type("Indie", offset=21, limit=21, sort_by='title') == by_title[21:42]
+    with pytest.raises(ValueError):
+        repository.get_games_of_type("Indie", sort_by='price')
+
+
+def test_repository_finds_games_like_the_memory_repository(empty_session, tmp_path):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=True)
+    in_memory_repo = MemoryRepository()
+    memory_repository.populate(in_memory_repo, str(tmp_path / "games.csv"))
+    # Games without a release date are never in a release date range, and sort before every date.
+    undated_game = Game(1, "Undated Game")
+    undated_game.price = 4.99
+    in_memory_repo.add_game(undated_game)
+    # Stored rows need a release date, so the game is stored with one and then cleared, like a row that predates
+    # the release_ordinal column.
+    stored_game = Game(1, "Undated Game")
+    stored_game.price = 4.99
+    stored_game.release_date = "Jan 1, 2000"
+    repository.add_multiple_games([stored_game])
+    empty_session.execute(games_table.update().where(games_table.c.game_id == 1).values(
+        release_date="", release_ordinal=None))
+    empty_session.commit()
+    assert [game.game_id for game in in_memory_repo.find_games(sort_by='release', limit=1)[1]] == [1]
+    queries = [
+        dict(released_to=date(2021, 6, 30)),
+        dict(sort_by='release', limit=5),
+        dict(sort_by='release', descending=True, max_price=5),
+        dict(genre="Indie"),
+        dict(sort_by='title', genre="Indie", offset=21, limit=21),
+        dict(sort_by='price', descending=True, max_price=5, limit=10),
+        dict(sort_by='release', descending=True, released_from=date(2018, 1, 1), released_to=date(2021, 6, 30)),
+        dict(sort_by='release', min_price=10, limit=5),
+    ]
+    for query in queries:
+        count, games = repository.find_games(**query)
+        expected_count, expected_games = in_memory_repo.find_games(**query)
+        assert count == expected_count
+        assert [game.game_id for game in games] == [game.game_id for game in expected_games]
+
+    with pytest.raises(ValueError):
+        repository.find_games(sort_by='rating')
+
+
+@pytest.mark.parametrize("bulk_load", [False, True])
+def test_repository_keeps_genre_counts_up_to_date(empty_session, tmp_path, bulk_load):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=bulk_load)
+    assert repository.get_number_of_games() == 99
+    counts = dict(repository.get_genre_counts())
+    assert counts["Indie"] == 64 and counts["Action"] == 99 and counts["Adventure"] == 82
+    assert counts["Strategy"] == 4
+
+    # Loading the catalog again, or moving a game to other genres, adjusts the counts instead of adding to them.
+    repository_populate.populate(tmp_path, repository)
+    game = Game(7940, "Call of Duty® 4")
+    game.price = 9.99
+    game.release_date = "Nov 12, 2007"
+    game.add_genre(Genre("Strategy"))
+    repository.add_multiple_games([game])
+    counts = dict(repository.get_genre_counts())
+    assert repository.get_number_of_games() == 99
+    assert counts["Action"] == 98 and counts["Strategy"] == 5
+    assert counts["Indie"] == 64 and counts["Adventure"] == 82
+    assert repository.get_number_of_games_of_type("Action") == len(repository.get_games_of_type("Action"))
+    assert repository.get_number_of_games_of_type("Strategy") == len(repository.get_games_of_type("Strategy"))
+
+
+@pytest.mark.parametrize("bulk_load", [False, True])
+def test_repository_bumps_the_catalog_version_on_writes(empty_session, tmp_path, bulk_load):
+    repository = make_populated_repository(empty_session, tmp_path, bulk_load=bulk_load)
+    version, modified_at = repository.get_catalog_version()
+    assert version > 0 and modified_at is not None
+
+    user = User("thorke", "Password1!")
+    repository.add_user(user)
+    assert repository.get_catalog_version()[0] == version
+
+    game = repository.get_game_by_id(7940)
+    repository.add_review(make_comment("Still great", user, 5, game, 'database'))
+    assert repository.get_catalog_version()[0] == version + 1
+    game = Game(1, "New Game")
+    game.price = 0.99
+    game.release_date = "Jan 1, 2024"
+    repository.add_game(game)
+    assert repository.get_catalog_version()[0] == version + 2
+    assert repository.get_catalog_version()[1] >= modified_at
+
+
+def test_game_page_costs_the_same_number_of_queries_for_any_number_of_reviews(tmp_path):
+    shutil.copy(get_project_root() / "tests" / "data" / "test_games.csv", tmp_path / "games.csv")
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'games.db'}",
+        'TEST_DATA_PATH': tmp_path,
+        'WTF_CSRF_ENABLED': False,
+    })
+    client = app.test_client()
+    repository = repo.repo_instance
+    statements = []
+    event.listen(repository._session_cm.session.get_bind(), "before_cursor_execute",
+                 lambda *args: statements.append(args[2]))
+
+    def queries_for_game_page():
+        statements.clear()
+        response = client.get('/game/7940')
+        assert response.status_code == 200
+        return len(statements)
+
+    def add_reviews(count):
+        for number in range(count):
+            user_name = f"reviewer{len(statements)}x{number}"
+            repository.add_user(User(user_name, 'Password1!'))
+            repository.add_review(make_comment(f"Review number {number}", repository.get_user(user_name), 4,
+                                               repository.get_game_by_id(7940), 'database'))
+        repository.close_session()
+
+    add_reviews(1)
+    queries_with_one_review = queries_for_game_page()
+    add_reviews(5)
+    assert queries_for_game_page() == queries_with_one_review
+    assert b"Review number 4" in client.get('/game/7940').data
@@ -0,0 +1,99 @@
+import contextlib
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import games.adapters.repository as repo
+from games import create_app
+from games.adapters import catalog_delta, database_template
+from utils import get_project_root
+
+TABLES = ('games', 'game_genres', 'publishers', 'genres', 'genre_counts', 'catalog_hashes')
+
+
+def table_counts(engine) -> dict:
+    with engine.connect() as connection:
+        return {table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                for table in TABLES + ('games_search',)}
+
+
+def test_template_is_built_once_per_csv_file(empty_session, tmp_path):
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    shutil.copy(get_project_root() / "tests" / "data" / "test_games.csv", data_path / "games.csv")
+    templates = tmp_path / "templates"
+
+    template = database_template.ensure_template(templates, data_path)
+    built_at = template.stat().st_mtime_ns
+    assert database_template.ensure_template(templates, data_path) == template
+    assert template.stat().st_mtime_ns == built_at
+
+    # Cloning into an in-memory engine and into a file yields the same populated database.
+    memory_engine = create_engine('sqlite://')
+    database_template.clone_into_engine(template, memory_engine)
+    database_template.clone_to_file(template, tmp_path / "staging.db")
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'staging.db'}")
+    counts = table_counts(memory_engine)
+    assert counts['games'] == counts['games_search'] == 99
+    assert table_counts(file_engine) == counts
+    assert {index['name'] for index in inspect(file_engine).get_indexes('games')} >= {'ix_games_game_price'}
+    file_engine.dispose()
+
+    # The template knows the csv rows it was built from, so a refresh right after cloning changes nothing.
+    session = sessionmaker(bind=memory_engine)()
+    assert catalog_delta.ingest_delta(data_path, session) == (0, 0, 0, 0)
+    session.close()
+
+    # A changed csv file gets a template of its own.
+    with open(data_path / "games.csv", 'a', encoding='utf-8') as file:
+        file.write("\n")
+    assert database_template.template_path(templates, data_path) != template
+
+
+def test_cloning_closes_the_template(empty_session, tmp_path, monkeypatch):
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    shutil.copy(get_project_root() / "tests" / "data" / "test_games.csv", data_path / "games.csv")
+    template = database_template.ensure_template(tmp_path / "templates", data_path)
+
+    connect = sqlite3.connect
+    template_connections = []
+
+    def recording_connect(*args, **kwargs):
+        template_connections.append(connect(*args, **kwargs))
+        return template_connections[-1]
+
+    monkeypatch.setattr(sqlite3, 'connect', recording_connect)
+    memory_engine = create_engine('sqlite://')
+    database_template.clone_into_engine(template, memory_engine)
+    monkeypatch.undo()
+
+    assert len(template_connections) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        template_connections[0].execute("SELECT 1")
+    # The clone does not depend on the template, which can be reopened or removed right away.
+    with contextlib.closing(sqlite3.connect(template)) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM games").fetchone() == (99,)
+    template.unlink()
+    assert table_counts(memory_engine)['games'] == 99
+
+
+def test_app_is_populated_from_the_template(tmp_path):
+    shutil.copy(get_project_root() / "tests" / "data" / "test_games.csv", tmp_path / "games.csv")
+    config = {
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'games.db'}",
+        'TEST_DATA_PATH': tmp_path,
+        'DATABASE_TEMPLATE_DIRECTORY': tmp_path / "templates",
+        'WTF_CSRF_ENABLED': False,
+    }
+    for _ in range(2):
+        app = create_app(config)
+        assert repo.repo_instance.get_number_of_games() == 99
+        assert app.test_client().get('/genres/Indie/1').status_code == 200
+        repo.repo_instance.close_session()
+    assert len(list((tmp_path / "templates").iterdir())) == 1
@@ -6,3 +6,102 @@ from sqlalchemy.exc import IntegrityError
 
 from games.domainmodel.model import User, make_comment
 
+import shutil
+
+from sqlalchemy import create_engine, event, inspect, select, text
+
+from games.adapters.orm import (
+    metadata, games_table, reviews_table, wishlist_table, map_model_to_tables, clear_model_mappers
+)
+from games.adapters.schema_upgrade import upgrade_schema
+from games.domainmodel.model import Game, Genre
+from utils import get_project_root
+
+
+def query_plan(session, statement) -> str:
+    sql = str(statement.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def test_hot_queries_use_indexes(empty_session):
+    plan = query_plan(empty_session, empty_session.query(User).filter(User._User__username == "thorke").statement)
+    assert "SEARCH users USING INDEX ix_users_username" in plan
+
+    genre_page = empty_session.query(Game).join(Game._Game__genres).filter(
+        Genre._Genre__genre_name == "Action").order_by(Game._Game__game_id).limit(21)
+    plan = query_plan(empty_session, genre_page.statement)
+    assert "USING COVERING INDEX ix_game_genres_genre_name_game_id" in plan
+    assert "SCAN game_genres" not in plan
+
+    plan = query_plan(empty_session, select([wishlist_table.c.game_id]).where(wishlist_table.c.user_id == 1))
+    assert "USING COVERING INDEX uq_wishlist_user_id_game_id" in plan
+
+    for column in (games_table.c.game_price, games_table.c.release_ordinal):
+        plan = query_plan(empty_session, select([games_table]).order_by(column).limit(21))
+        assert f"SCAN games USING INDEX ix_games_{column.name}" in plan
+        plan = query_plan(empty_session, select([games_table.c.game_id]).where(column >= 5))
+        assert f"SEARCH games USING COVERING INDEX ix_games_{column.name}" in plan
+
+    title_page = select([games_table]).order_by(games_table.c.game_title, games_table.c.game_id).limit(21)
+    plan = query_plan(empty_session, title_page)
+    assert "SCAN games USING INDEX ix_games_game_title" in plan
+    assert "TEMP B-TREE" not in plan
+    # Descending titles keep ascending ids, so only games with equal titles are sorted apart from the index.
+    title_page = select([games_table]).order_by(games_table.c.game_title.desc(), games_table.c.game_id).limit(21)
+    plan = query_plan(empty_session, title_page)
+    assert "SCAN games USING INDEX ix_games_game_title" in plan
+    assert "TEMP B-TREE FOR ORDER BY" not in plan
+
+    plan = query_plan(empty_session, select([reviews_table]).where(reviews_table.c.user_id == 1))
+    assert "SEARCH reviews USING INDEX ix_reviews_user_id" in plan
+    plan = query_plan(empty_session, select([reviews_table]).where(reviews_table.c.game_id == 7940))
+    assert "SEARCH reviews USING INDEX ix_reviews_game_id" in plan
+
+
+def test_wishlist_rows_are_unique(empty_session):
+    empty_session.execute(wishlist_table.insert(), {'user_id': 1, 'game_id': 7940})
+    with pytest.raises(IntegrityError):
+        empty_session.execute(wishlist_table.insert(), {'user_id': 1, 'game_id': 7940})
+
+
+def test_upgrade_adds_indexes_to_an_existing_database(tmp_path):
+    # games.db in the project folder was created before any secondary index existed.
+    shutil.copy(get_project_root() / "games.db", tmp_path / "games.db")
+    engine = create_engine(f"sqlite:///{tmp_path / 'games.db'}")
+    with engine.begin() as connection:
+        connection.execute(wishlist_table.insert(), [{'user_id': 1, 'game_id': 7940}, {'user_id': 1, 'game_id': 7940}])
+        number_of_games = connection.execute(text("SELECT COUNT(*) FROM games")).scalar()
+
+    upgrade_schema(engine)
+    # Running it again changes nothing, and does not scan the wishlist or create indexes again.
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    upgrade_schema(engine)
+    assert not [statement for statement in statements
+                if statement.startswith(('DELETE', 'CREATE INDEX', 'CREATE UNIQUE INDEX'))]
+
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        names = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= names
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM games")).scalar() == number_of_games
+        assert connection.execute(text("SELECT COUNT(*) FROM wishlist")).scalar() == 1
+        assert connection.execute(text("SELECT COUNT(*) FROM games_search")).scalar() == number_of_games
+        assert connection.execute(text("SELECT game_count FROM genre_counts WHERE genre_name = ''")).scalar() == \
+               number_of_games
+        # Release dates added as ordinals to rows that predate the column.
+        assert connection.execute(text(
+            "SELECT COUNT(*) FROM games WHERE release_ordinal IS NULL AND release_date != ''")).scalar() == 0
+    engine.dispose()
+
+
+def test_unmapped_games_store_their_fields_in_slots_again(empty_session):
+    # While mapped, SQLAlchemy keeps the fields in the instance dict.
+    assert vars(Game(1, "Mapped Game"))
+    clear_model_mappers()
+    game = Game(2, "Unmapped Game")
+    assert vars(game) == {}
+    assert game.title == "Unmapped Game"
+    assert vars(Genre("Action")) == {}
+    map_model_to_tables()
@@ -1,16 +1,25 @@
-from sqlalchemy import select, inspect
+import csv
 
-from games.adapters.orm import metadata
+import pytest
+
+from sqlalchemy import select, inspect, func
+from sqlalchemy.orm import sessionmaker
+
+from games.adapters.orm import metadata, search_table, game_genres_table, games_table
 from games.domainmodel.model import Game, User, Review
 from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters import catalog_delta, catalog_counts, catalog_version, repository_populate
+from utils import get_project_root
 from tests_db.conftest import session_factory
 
 
 def test_database_populate_inspect_table_names(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    assert inspector.get_table_names() == ['game_genres', 'games', 'genres',
-                                           'publishers', 'reviews', "users", "wishlist"]
+    assert inspector.get_table_names() == ['catalog_hashes', 'catalog_version', 'game_genres', 'games',
+                                           'games_search', 'games_search_config', 'games_search_content',
+                                           'games_search_data', 'games_search_docsize', 'games_search_idx',
+                                           'genre_counts', 'genres', 'publishers', 'reviews', "users", "wishlist"]
 
 
 def test_database_populate_select_all_users(database_engine, session_factory):
@@ -22,7 +31,7 @@ def test_database_populate_select_all_users(database_engine, session_factory):
 
     repo = SqlAlchemyRepository(session_factory)
 
-    name_of_users_table = inspector.get_table_names()[5]
+    name_of_users_table = inspector.get_table_names()[14]
     repo.add_user(a_user1)
     repo.add_user(a_user2)
 
@@ -36,3 +45,88 @@ def test_database_populate_select_all_users(database_engine, session_factory):
             all_users.append(row['user_name'])
 
         assert all_users == ['thorke', 'fmercury']
+
+
+def write_games_csv(path, rows):
+    with open(path / "games.csv", "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_delta_ingest_only_applies_changed_games(empty_session, tmp_path):
+    with open(get_project_root() / "tests" / "data" / "test_games.csv", encoding="utf-8-sig") as file:
+        rows = list(csv.DictReader(file))
+    write_games_csv(tmp_path, rows)
+
+    # The first ingest into an empty database inserts every game.
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (99, 0, 0, 0)
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (0, 0, 0, 0)
+    # Only the ingest that changed something bumps the catalog version.
+    assert catalog_version.get_version(empty_session)[0] == 1
+
+    user = User("thorke", "Password1!")
+    game = empty_session.query(Game).get(7940)
+    empty_session.add(Review(user, game, 5, "Still here"))
+    empty_session.commit()
+
+    # Change a price, drop a reviewed game and an unreviewed one, and add a new game.
+    rows[1]["Price"] = "1.99"
+    removed_id = int(rows[2]["AppID"])
+    new_row = dict(rows[3], AppID="99999999", Name="Brand New Game")
+    rows = [rows[0], rows[1], new_row] + rows[3:]
+    rows = [row for row in rows if row["AppID"] != "7940"]
+    write_games_csv(tmp_path, rows)
+
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (1, 1, 1, 1)
+    assert catalog_version.get_version(empty_session)[0] == 2
+    empty_session.expire_all()
+    assert empty_session.query(Game).get(int(rows[0]["AppID"])).price == 1.99
+    assert empty_session.query(Game).get(removed_id) is None
+    assert empty_session.query(Game).get(99999999).title == "Brand New Game"
+    # The reviewed game is kept, and so is its review.
+    assert empty_session.query(Game).get(7940) is not None
+    assert empty_session.query(Review).count() == 1
+    # The search index follows the catalog.
+    indexed_ids = set(empty_session.execute(select([search_table.c.rowid])).scalars())
+    assert 99999999 in indexed_ids and removed_id not in indexed_ids
+    assert len(indexed_ids) == empty_session.query(Game).count()
+    # So do the genre counts.
+    counts = catalog_counts.get_genre_counts(empty_session)
+    assert catalog_counts.get_count(empty_session) == empty_session.query(Game).count()
+    assert counts == [(genre_name, count) for genre_name, count in empty_session.execute(
+        select([game_genres_table.c.genre_name, func.count()]).group_by(game_genres_table.c.genre_name)
+        .order_by(game_genres_table.c.genre_name))]
+
+
+def test_delta_ingest_after_a_full_populate_changes_nothing(empty_session, tmp_path):
+    with open(get_project_root() / "tests" / "data" / "test_games.csv", encoding="utf-8-sig") as file:
+        rows = list(csv.DictReader(file))
+    write_games_csv(tmp_path, rows)
+    repository = SqlAlchemyRepository(sessionmaker(bind=empty_session.bind), bulk_load=True)
+    repository_populate.populate(tmp_path, repository)
+    catalog_delta.record_row_hashes(tmp_path, empty_session)
+
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (0, 0, 0, 0)
+    rows[0]["Price"] = "0.49"
+    write_games_csv(tmp_path, rows)
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (0, 1, 0, 0)
+
+
+def test_duplicated_app_ids_keep_their_first_row_when_populating_and_ingesting(empty_session, tmp_path):
+    with open(get_project_root() / "tests" / "data" / "test_games.csv", encoding="utf-8-sig") as file:
+        rows = list(csv.DictReader(file))
+    # The later row lands in another batch than the first one.
+    write_games_csv(tmp_path, rows + [dict(rows[0], Name="Duplicate Title")])
+    repository = SqlAlchemyRepository(sessionmaker(bind=empty_session.bind), bulk_load=True, batch_size=10)
+    repository_populate.populate(tmp_path, repository, batch_size=10)
+    catalog_delta.record_row_hashes(tmp_path, empty_session)
+
+    assert catalog_delta.ingest_delta(tmp_path, empty_session) == (0, 0, 0, 0)
+    assert empty_session.execute(select([games_table.c.game_title]).where(
+        games_table.c.game_id == int(rows[0]["AppID"]))).scalar() == rows[0]["Name"]
+
+
+def test_delta_ingest_refuses_a_missing_csv_file(empty_session, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        catalog_delta.ingest_delta(tmp_path, empty_session)